@@ -0,0 +1 @@
+"""Benchmarks for the game's hot paths, run headlessly. See `py -m benchmarks --help`."""
@@ -0,0 +1,97 @@
+"""
+Run the benchmarks, save the results as JSON, and check them against a baseline.
+
+    py -m benchmarks --output results.json
+    py -m benchmarks --save-baseline
+    py -m benchmarks --baseline benchmarks/baseline.json
+
+The committed baseline was measured on one computer, so timings from another are
+best compared against a baseline saved there first with --save-baseline.
+"""
+
+import argparse
+import json
+import platform
+import sys
+from pathlib import Path
+
+from .cases import BENCHMARKS, run_all
+from .timing import THRESHOLD, compare
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the game's hot paths.")
+    parser.add_argument("names", nargs="*", help="the benchmarks to run (default: all)")
+    parser.add_argument("--list", action="store_true", help="list the benchmarks")
+    parser.add_argument(
+        "--budget", type=float, default=1.0, help="seconds to spend on each benchmark"
+    )
+    parser.add_argument("--output", help="save the results to this JSON file")
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=BASELINE,
+        help="the results to compare against (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--save-baseline", action="store_true", help="save the results as the baseline"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="how much slower, as a fraction, counts as a regression",
+    )
+    args = parser.parse_args()
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run_all(names, args.budget)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "benchmarks": results,
+    }
+
+    regressions = []
+    if args.baseline.exists() and not args.save_baseline:
+        with args.baseline.open() as file:
+            baseline = json.load(file)["benchmarks"]
+        report["comparison"] = compare(results, baseline, args.threshold)
+        regressions = [
+            name for name, result in report["comparison"].items() if result["regressed"]
+        ]
+
+    for name, result in results.items():
+        if "skipped" in result:
+            print(f"{name:28} skipped ({result['skipped']})")
+            continue
+        line = f"{name:28} {result['median_us']:12.1f} us"
+        if name in report.get("comparison", {}):
+            ratio = report["comparison"][name]["ratio"]
+            line += f"  {ratio:5.2f}x baseline"
+            if name in regressions:
+                line += "  REGRESSED"
+        print(line)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(report, file, indent=2)
+    if args.save_baseline:
+        with args.baseline.open("w") as file:
+            json.dump(report, file, indent=2)
+
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,225 @@
+"""
+Each benchmark is a function that sets up what it measures and returns a function
+that does one run of it.
+"""
+
+# Must come first so pygame starts with the dummy drivers
+from game_jam import headless  # noqa: F401
+
+import asyncio
+import itertools
+import random
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+import pygame
+
+from game_jam import audio_processing
+from game_jam.clock import VirtualClock
+from game_jam.constants import SOUNDS, SPRITES, WIDTH
+from game_jam.display import SCALERS, get_screen, present
+from game_jam.events import get_value
+from game_jam.gui import Button, Text
+
+Benchmark = Callable[[], Callable[[], None]]
+
+BENCHMARKS: dict[str, Benchmark] = {}
+
+
+def benchmark(name: str):
+    """Add a function to the suite under a name."""
+
+    def register(function: Benchmark) -> Benchmark:
+        BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def get_game():
+    """The game from main.py, started headlessly."""
+
+    from main import my_game
+
+    if not isinstance(my_game.clock, VirtualClock):
+        my_game.clock = VirtualClock()
+        my_game.start()
+    return my_game
+
+
+def get_level(jars: int):
+    """
+    Level Two, loaded and filled with jars in random places.
+
+    :param jars: How many jars to add.
+    """
+
+    game = get_game()
+    level = game.get_window("Level Two")
+    for future in level.prefetch():
+        future.result()
+    game.open("Level Two")
+    # Jars are added by hand, so the spawner isn't needed
+    level.tasks.cancel()
+    level.lose_life = lambda: None
+
+    random.seed(0)
+    field = level.elements.get("Jars")
+    for _ in range(jars):
+        field.spawn(random.randrange(5), random.randrange(4), random.uniform(-100, 700))
+    return level
+
+
+@benchmark("window_display")
+def window_display():
+    window = get_game().get_window("Menu")
+    present(window.display_elements())
+    return lambda: present(window.display_elements())
+
+
+@benchmark("window_display_full")
+def window_display_full():
+    window = get_game().get_window("Menu")
+
+    def run():
+        window.invalidate()
+        present(window.display_elements())
+
+    return run
+
+
+def level_display(jars: int):
+    level = get_level(jars)
+    field = level.elements.get("Jars")
+    tops = field.top[: len(field)].copy()
+    runs = itertools.count()
+
+    def run():
+        # Move the jars back and forth between two places, so they are redrawn like
+        # they would be in a game but never fall off the screen and disappear
+        field.top[: len(tops)] = tops + next(runs) % 2
+        level.save_positions()
+        field.fall(1)
+        present(level.display_elements())
+
+    return run
+
+
+for count in (0, 50, 500):
+    benchmark(f"level_display_{count}_jars")(lambda count=count: level_display(count))
+
+
+def level_update(jars: int):
+    game = get_game()
+    level = get_level(jars)
+    field = level.elements.get("Jars")
+    tops = field.top[: len(field)].copy()
+
+    def run():
+        # Put the jars back so none of them fall off the screen and disappear
+        field.top[: len(tops)] = tops
+        level.save_positions()
+        level.update_elements(game)
+
+    return run
+
+
+for count in (50, 500):
+    benchmark(f"level_update_{count}_jars")(lambda count=count: level_update(count))
+
+
+def scale_to_window(scaler: str):
+    # Scaling is skipped in headless runs, so time it on its own at a common 1440p size
+    get_game()
+    screen = get_screen()
+    window = pygame.Surface((2560, 1440)).convert()
+    return lambda: SCALERS[scaler](screen, window.get_size(), window)
+
+
+for name in SCALERS:
+    benchmark(f"present_scale_{name}")(lambda name=name: scale_to_window(name))
+
+
+@benchmark("text_show")
+def text_show():
+    text = Text("Score", (WIDTH // 2 - 100, 200, 200, 50))
+    return text.show
+
+
+@benchmark("text_show_changing")
+def text_show_changing():
+    text = Text("0", (WIDTH // 2 - 100, 200, 200, 50), font_size=75)
+    scores = iter(range(10**9))
+
+    def run():
+        text.message = next(scores) * 100
+        text.show()
+
+    return run
+
+
+@benchmark("button_construction")
+def button_construction():
+    get_game()
+    return lambda: Button(SPRITES / "redJar.png", (100, 100))
+
+
+@benchmark("settings_read")
+def settings_read():
+    return lambda: get_value("Effects Volume")
+
+
+@benchmark("beats_cached")
+def beats_cached():
+    audio_processing.get_each_note(SOUNDS / "rushE.ogg")
+    return lambda: audio_processing.get_each_note(SOUNDS / "rushE.ogg")
+
+
+@benchmark("beats_cold")
+def beats_cold():
+    # Finding beats needs librosa, which is only needed to build new caches
+    import librosa
+
+    cache = audio_processing.AUDIO_CACHE
+    legacy = audio_processing.LEGACY_CACHES
+
+    def run():
+        # A new, empty cache every run, deleted as soon as the run is done
+        with tempfile.TemporaryDirectory() as directory:
+            audio_processing.AUDIO_CACHE = Path(directory)
+            audio_processing.LEGACY_CACHES = ()
+            try:
+                audio_processing.get_each_note(SOUNDS / "ode-to-joy.ogg")
+            finally:
+                audio_processing.AUDIO_CACHE = cache
+                audio_processing.LEGACY_CACHES = legacy
+
+    return run
+
+
+def run_all(names: list[str], budget: float) -> dict[str, dict]:
+    """
+    Run benchmarks and time them.
+
+    :param names: The benchmarks to run.
+    :param budget: About how many seconds to spend on each benchmark.
+    :returns: The timing results of each benchmark, or why it was skipped.
+    """
+
+    from .timing import measure
+
+    async def run():
+        results = {}
+        for name in names:
+            try:
+                function = BENCHMARKS[name]()
+            except ImportError as error:
+                results[name] = {"skipped": f"missing {error.name}"}
+                continue
+            results[name] = measure(function, budget)
+            # Let the event loop tidy up anything the benchmark started
+            await asyncio.sleep(0)
+        return results
+
+    return asyncio.run(run())
@@ -0,0 +1,59 @@
+"""Times benchmarks and compares the results against a saved baseline."""
+
+import statistics
+from time import perf_counter_ns
+from typing import Callable
+
+# How much slower than the baseline a benchmark can get before it counts as a regression
+THRESHOLD = 0.2
+
+
+def measure(function: Callable[[], None], budget: float = 1.0) -> dict[str, float]:
+    """
+    Call a function repeatedly and time each call.
+
+    :param function: The function to time.
+    :param budget: About how many seconds to spend calling it.
+    :returns: The number of calls and the fastest, median, and mean time per call in
+        microseconds.
+    """
+
+    # One untimed call, so first-time costs like filling caches aren't counted
+    function()
+
+    times = []
+    deadline = perf_counter_ns() + budget * 1e9
+    while len(times) < 5 or (perf_counter_ns() < deadline and len(times) < 100_000):
+        started = perf_counter_ns()
+        function()
+        times.append(perf_counter_ns() - started)
+
+    return {
+        "runs": len(times),
+        "min_us": min(times) / 1000,
+        "median_us": statistics.median(times) / 1000,
+        "mean_us": statistics.fmean(times) / 1000,
+    }
+
+
+def compare(
+    results: dict[str, dict], baseline: dict[str, dict], threshold: float = THRESHOLD
+) -> dict[str, dict]:
+    """
+    Compare each benchmark's median time against the baseline.
+
+    :param results: The results of this run.
+    :param baseline: The results to compare against.
+    :param threshold: How much slower, as a fraction, counts as a regression.
+    :returns: The ratio of new to old time for each benchmark in both, and whether
+        it regressed.
+    """
+
+    comparison = {}
+    for name, result in results.items():
+        old = baseline.get(name, {})
+        if "median_us" not in result or "median_us" not in old:
+            continue
+        ratio = result["median_us"] / old["median_us"]
+        comparison[name] = {"ratio": ratio, "regressed": ratio > 1 + threshold}
+    return comparison
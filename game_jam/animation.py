@@ -0,0 +1,82 @@
+"""Animations made of a few images, loaded once into a single strip."""
+
+from pathlib import Path
+
+import pygame
+
+from .cache import TEXTURES
+
+
+class Animation:
+    """
+    A sequence of images, each shown for the same number of updates.
+
+    Every image is drawn side by side onto one strip, and each frame is a
+    subsurface of it, so showing a frame never loads or scales anything.
+    """
+
+    def __init__(self, paths: list[Path], duration: int, size: tuple[int, int] = None):
+        """
+        :param paths: The file path to each image, in order.
+        :param duration: How many updates each image is shown for.
+        :param size: The width and height to scale every image to, or None to keep
+            the size of the first image.
+        """
+
+        images = [TEXTURES.get(path, size) for path in paths]
+        width, height = images[0].get_size() if size is None else size
+
+        self.duration = duration
+        self.strip = pygame.Surface((width * len(images), height), pygame.SRCALPHA)
+        self.frames = []
+        for i, image in enumerate(images):
+            self.strip.blit(image, (i * width, 0))
+            self.frames.append(self.strip.subsurface((i * width, 0, width, height)))
+
+    def __len__(self):
+        """How many updates the whole animation lasts."""
+        return len(self.frames) * self.duration
+
+    def image(self, index: int) -> pygame.Surface:
+        """
+        Gives the image to show after a number of updates. Stays on the last
+        image once the animation is over.
+
+        :param index: How many updates the animation has been playing for.
+        """
+
+        return self.frames[min(index // self.duration, len(self.frames) - 1)]
+
+
+# Keyed by name and size, since the same images can be scaled to different sizes
+ANIMATIONS: dict[tuple[str, tuple[int, int] | None], Animation] = {}
+
+
+def register_animation(
+    name: str, paths: list[Path], duration: int, size: tuple[int, int] = None
+) -> Animation:
+    """
+    Load an animation so it can be played by name. Loading the same name at the same
+    size again gives back the animation that was already loaded.
+
+    :param name: What the animation will be called.
+    :param paths: The file path to each image, in order.
+    :param duration: How many updates each image is shown for.
+    :param size: The width and height to scale every image to.
+    """
+
+    key = (name, None if size is None else tuple(size))
+    if key not in ANIMATIONS:
+        ANIMATIONS[key] = Animation(paths, duration, size)
+    return ANIMATIONS[key]
+
+
+def get_animation(name: str, size: tuple[int, int] = None) -> Animation:
+    """
+    Gives a loaded animation.
+
+    :param name: The name the animation was registered with.
+    :param size: The size the animation was registered with.
+    """
+
+    return ANIMATIONS[name, None if size is None else tuple(size)]
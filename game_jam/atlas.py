@@ -0,0 +1,173 @@
+"""
+Packs the small sprites into a few texture sheets so they load from one file.
+
+Rebuild the atlas after adding or changing a sprite by running:
+    py -m game_jam.atlas
+"""
+
+import json
+from pathlib import Path
+
+import pygame
+
+from .constants import ASSETS, SPRITES
+
+ATLAS = ASSETS / "atlas"
+INDEX = ATLAS / "atlas.json"
+
+# Anything bigger than this, like the backgrounds, is left as its own file
+LARGEST_SPRITE = 300
+SHEET_WIDTH = 1024
+SHEET_HEIGHT = 512
+PADDING = 1
+
+# Where each sprite is in the atlas: the sheet it's on, then its x, y, width, height
+Placement = tuple[int, int, int, int, int]
+
+
+def pack(sizes: dict[str, tuple[int, int]]) -> dict[str, Placement]:
+    """
+    Arrange rectangles into rows on as few sheets as possible.
+
+    :param sizes: The width and height of each image, by name.
+    :returns: Where each image goes.
+    """
+
+    placements = {}
+    sheet = x = y = row_height = 0
+
+    # Placing the tallest images first keeps each row from wasting space
+    for name, (width, height) in sorted(
+        sizes.items(), key=lambda item: (-item[1][1], -item[1][0], item[0])
+    ):
+        if x + width > SHEET_WIDTH:
+            x = 0
+            y += row_height + PADDING
+            row_height = 0
+        if y + height > SHEET_HEIGHT:
+            sheet += 1
+            x = y = row_height = 0
+
+        placements[name] = (sheet, x, y, width, height)
+        x += width + PADDING
+        row_height = max(row_height, height)
+
+    return placements
+
+
+def build_atlas(directory: Path = SPRITES, output: Path = ATLAS) -> dict[str, Placement]:
+    """
+    Pack every small image in a directory into sheets, and save them with an index.
+
+    :param directory: The directory of sprites to pack.
+    :param output: The directory to save the sheets and index to.
+    :returns: Where each sprite was placed.
+    """
+
+    images = {}
+    for path in sorted(directory.glob("*.png")):
+        image = pygame.image.load(path)
+        if max(image.get_size()) <= LARGEST_SPRITE:
+            images[path.name] = image
+
+    placements = pack({name: image.get_size() for name, image in images.items()})
+
+    sheet_count = max((sheet for sheet, *_ in placements.values()), default=-1) + 1
+    sheets = [
+        pygame.Surface((SHEET_WIDTH, SHEET_HEIGHT), pygame.SRCALPHA)
+        for _ in range(sheet_count)
+    ]
+    for name, (sheet, x, y, _, _) in placements.items():
+        sheets[sheet].blit(images[name], (x, y))
+
+    output.mkdir(parents=True, exist_ok=True)
+    for i, sheet in enumerate(sheets):
+        pygame.image.save(sheet, output / f"atlas{i}.png")
+
+    with (output / INDEX.name).open("w") as file:
+        json.dump({"sheets": sheet_count, "sprites": placements}, file, sort_keys=True)
+
+    return placements
+
+
+class Atlas:
+    """The packed sprite sheets, loaded the first time a sprite is asked for."""
+
+    def __init__(self, index: Path = INDEX, directory: Path = SPRITES):
+        """
+        :param index: The JSON file saying where each sprite is.
+        :param directory: The directory the packed sprites came from.
+        """
+
+        self.index = index
+        self.directory = directory
+        self._placements: dict[str, Placement] | None = None
+        self._sheet_count = 0
+        self._sheets: dict[int, pygame.Surface] = {}
+
+    @property
+    def placements(self) -> dict[str, Placement]:
+        """Where each sprite is, or nothing if the atlas hasn't been built."""
+
+        if self._placements is None:
+            self._placements = {}
+            if self.index.exists():
+                with self.index.open() as file:
+                    data = json.load(file)
+                self._sheet_count = data["sheets"]
+                self._placements = {
+                    name: tuple(placement) for name, placement in data["sprites"].items()
+                }
+        return self._placements
+
+    @property
+    def unloaded_sheets(self) -> dict[int, Path]:
+        """The file path of each sheet that hasn't been loaded yet, by its number."""
+
+        self.placements
+        return {
+            sheet: self.index.parent / f"atlas{sheet}.png"
+            for sheet in range(self._sheet_count)
+            if sheet not in self._sheets
+        }
+
+    def add_sheet(self, sheet: int, image: pygame.Surface) -> None:
+        """
+        Use a sheet that was already decoded somewhere else.
+
+        :param sheet: The number of the sheet.
+        :param image: The decoded sheet.
+        """
+
+        if sheet not in self._sheets:
+            if pygame.display.get_surface() is not None:
+                image = image.convert_alpha()
+            self._sheets[sheet] = image
+
+    def __contains__(self, path: Path | str) -> bool:
+        path = Path(path)
+        return path.parent == self.directory and path.name in self.placements
+
+    def get(self, path: Path | str) -> pygame.Surface | None:
+        """
+        Gives a sprite as part of its sheet.
+
+        :param path: The file path the sprite was packed from.
+        :returns: The sprite, or None if it isn't in the atlas.
+        """
+
+        if path not in self:
+            return None
+
+        sheet, x, y, width, height = self.placements[Path(path).name]
+        if sheet not in self._sheets:
+            self.add_sheet(sheet, pygame.image.load(self.unloaded_sheets[sheet]))
+        return self._sheets[sheet].subsurface((x, y, width, height))
+
+
+SPRITE_ATLAS = Atlas()
+
+
+if __name__ == "__main__":
+    placed = build_atlas()
+    print(f"Packed {len(placed)} sprites into {ATLAS}")
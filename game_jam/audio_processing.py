@@ -1,37 +1,231 @@
-"""Handles all the processing of audio."""
+"""
+Handles all the processing of audio.
+
+Finding the beats in a song is slow, so the beats are saved in the audio cache.
+Each cache file is named after a hash of the song's contents and of how the beats
+were found, so changing either one finds the beats again instead of using old ones.
+
+Beat caches from older versions of the game, saved as JSON next to each song, can
+be checked and converted by running:
+    py -m game_jam.audio_processing
+"""
+
+import hashlib
 import json
+import math
+import os
 from pathlib import Path
 
+import numpy as np
+
+from .constants import SOUNDS
 
 AUDIO_CACHE = Path(__file__).parent / "audio_cache"
 
+# Change this whenever the way beats are found changes, so old caches aren't used
+ANALYZER_VERSION = 1
+BEAT_PARAMETERS = {"tightness": 10.0}
+
+# Where older versions of the game saved the beats of each song, as JSON
+LEGACY_CACHES = (SOUNDS, AUDIO_CACHE)
+LEGACY_SUFFIX = ".cache"
 
-def get_each_note(path: Path) -> list[float]:
+_digests: dict[tuple[str, int, int], str] = {}
+
+
+def get_each_note(path: Path) -> np.ndarray:
     """
     Returns the time of the beginning of each note in a song.
 
     :param path: The Path object of the sound file.
+    :returns: The time of each note in seconds, as a read-only float32 array.
     """
 
-    filename = str(path).rsplit('/', maxsplit=1)[-1] + ".cache"
-    cached_filename = AUDIO_CACHE / filename
-    if cached_filename.exists():
-        with cached_filename.open() as file:
-            times = json.load(file)
-            return list(times)
+    path = Path(path)
+    cached = cache_path(path)
+    if cached.exists():
+        try:
+            return load_beats(cached)
+        except (ValueError, EOFError):
+            # Left broken by something other than this module, so find them again
+            pass
 
-    import librosa
+    times = read_legacy_cache(path)
+    if times is None:
+        times = find_beats(path)
+
+    save_beats(cached, times)
+    return load_beats(cached)
 
-    cached_filename.touch()
+
+def find_beats(path: Path) -> np.ndarray:
+    """
+    Find the beats of a song, without using the cache.
+
+    :param path: The Path object of the sound file.
+    """
+
+    import librosa
 
     y, sr = librosa.load(path)
     onset_env = librosa.onset.onset_strength(y=y, sr=sr)
-    beats = librosa.beat.beat_track(y=y, onset_envelope=onset_env, sr=sr, tightness=10.0)[1]
-    times = librosa.frames_to_time(beats, sr=sr)
+    beats = librosa.beat.beat_track(
+        y=y, onset_envelope=onset_env, sr=sr, **BEAT_PARAMETERS
+    )[1]
+    return librosa.frames_to_time(beats, sr=sr).astype(np.float32)
+
+
+def cache_key(path: Path) -> str:
+    """
+    Names the beats of a song, found with the current analyzer and parameters.
+
+    :param path: The Path object of the sound file.
+    """
+
+    settings = json.dumps(
+        {"version": ANALYZER_VERSION, "parameters": BEAT_PARAMETERS}, sort_keys=True
+    )
+    key = hashlib.sha256(content_digest(path).encode() + settings.encode())
+    return key.hexdigest()[:32]
+
+
+def cache_path(path: Path) -> Path:
+    """
+    Where the beats of a song are cached.
+
+    :param path: The Path object of the sound file.
+    """
+
+    return AUDIO_CACHE / f"{Path(path).stem}-{cache_key(path)}.npy"
+
+
+def content_digest(path: Path) -> str:
+    """
+    The SHA-256 hash of a file. It's only worked out again if the file changes.
+
+    :param path: The file to hash.
+    """
 
-    times = list(times)
+    stat = os.stat(path)
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if key not in _digests:
+        _digests[key] = hashlib.sha256(Path(path).read_bytes()).hexdigest()
+    return _digests[key]
 
-    with cached_filename.open("w") as file:
-        json.dump(times, file)
 
+def load_beats(path: Path) -> np.ndarray:
+    """
+    Read cached beats, mapping the file into memory instead of copying it.
+
+    :param path: The cache file.
+    :raises ValueError: If the file isn't a list of beat times.
+    """
+
+    times = np.load(path, mmap_mode="r", allow_pickle=False)
+    if times.dtype != np.float32 or times.ndim != 1:
+        raise ValueError(f"{path} is not a beat cache")
     return times
+
+
+def save_beats(path: Path, times: np.ndarray) -> None:
+    """
+    Write beats to the cache. A crash part way through never leaves a broken file.
+
+    :param path: The cache file.
+    :param times: The time of each beat, in seconds.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    with temporary.open("wb") as file:
+        np.save(file, np.asarray(times, dtype=np.float32))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+def validate_beats(times) -> np.ndarray | None:
+    """
+    Checks that some beat times could have come from a song.
+
+    :param times: The times, in seconds.
+    :returns: The times sorted as a float32 array, or None if they aren't valid.
+    """
+
+    if not isinstance(times, list) or not times:
+        return None
+    if not all(
+        isinstance(time, (int, float)) and math.isfinite(time) and time >= 0
+        for time in times
+    ):
+        return None
+    return np.sort(np.asarray(times, dtype=np.float32))
+
+
+def read_legacy_cache(path: Path) -> np.ndarray | None:
+    """
+    Gives the beats of a song from an older version's JSON cache, if there is a
+    valid one.
+
+    :param path: The Path object of the sound file.
+    """
+
+    for directory in LEGACY_CACHES:
+        legacy = directory / (Path(path).name + LEGACY_SUFFIX)
+        try:
+            with legacy.open() as file:
+                times = validate_beats(json.load(file))
+        except (OSError, ValueError):
+            continue
+        if times is not None:
+            return times
+    return None
+
+
+def repair_legacy_caches(remove: bool = False) -> dict[str, list[Path]]:
+    """
+    Convert every valid older JSON cache, and find the ones that can't be used.
+
+    :param remove: Whether to delete the JSON caches afterwards. Broken ones are
+        always deleted.
+    :returns: The JSON caches that were converted, that were broken, and that
+        belong to songs that don't exist.
+    """
+
+    report = {"converted": [], "broken": [], "orphaned": []}
+    for directory in LEGACY_CACHES:
+        for legacy in sorted(directory.glob(f"*{LEGACY_SUFFIX}")):
+            song = SOUNDS / legacy.name.removesuffix(LEGACY_SUFFIX)
+            try:
+                with legacy.open() as file:
+                    times = validate_beats(json.load(file))
+            except ValueError:
+                times = None
+
+            if times is None:
+                report["broken"].append(legacy)
+            elif not song.exists():
+                report["orphaned"].append(legacy)
+            else:
+                cached = cache_path(song)
+                if not cached.exists():
+                    save_beats(cached, times)
+                report["converted"].append(legacy)
+
+            if remove or times is None:
+                legacy.unlink()
+    return report
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Convert old JSON beat caches.")
+    parser.add_argument(
+        "--remove", action="store_true", help="delete the JSON caches once converted"
+    )
+    results = repair_legacy_caches(parser.parse_args().remove)
+    for outcome, paths in results.items():
+        print(f"{outcome.capitalize()}: {len(paths)}")
+        for legacy in paths:
+            print(f"    {legacy}")
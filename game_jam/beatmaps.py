@@ -0,0 +1,132 @@
+"""
+Finds the beats of every song the levels play ahead of time, so the game never has to.
+
+Run this after adding or changing a song, and commit the new files in the audio cache:
+    py -m game_jam.beatmaps
+
+Songs are analyzed in parallel, one per core. Songs whose beats are already cached
+for their current contents are skipped. This needs librosa, but the game itself
+doesn't once every song has been compiled.
+"""
+
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from time import perf_counter
+
+from . import audio_processing
+from .constants import SONGS
+
+SONG_SUFFIXES = (".ogg", ".wav", ".mp3", ".flac")
+# Copies of the sounds made for the browser build, which never have their beats found
+BROWSER_SUFFIX = "-pygbag"
+
+
+def find_songs(directory: Path) -> list[Path]:
+    """
+    Every audio file in a directory and the directories inside it, other than the
+    copies made for the browser build.
+
+    :param directory: The directory to search.
+    """
+
+    return sorted(
+        path
+        for path in directory.rglob("*")
+        if path.suffix.lower() in SONG_SUFFIXES
+        and not path.stem.endswith(BROWSER_SUFFIX)
+    )
+
+
+def compile_song(song: Path, output: Path) -> tuple[int, float]:
+    """
+    Find the beats of a song and save them to the cache.
+
+    :param song: The song to analyze.
+    :param output: The cache file to write.
+    :returns: How many beats were found, and how many seconds it took.
+    """
+
+    started = perf_counter()
+    times = audio_processing.find_beats(song)
+    audio_processing.save_beats(output, times)
+    return len(times), perf_counter() - started
+
+
+def compile_songs(
+    songs: list[Path], workers: int = None, force: bool = False
+) -> dict[Path, tuple[int, float] | Exception | None]:
+    """
+    Compile the beats of many songs at once, printing each as it finishes.
+
+    :param songs: The songs to compile.
+    :param workers: How many songs to analyze at the same time. Defaults to the
+        number of cores.
+    :param force: Whether to analyze songs that are already cached.
+    :returns: The beat count and time taken for each song that was compiled, the
+        error for each that failed, and None for each that was already cached.
+    """
+
+    results = {}
+    outputs = {}
+    for song in songs:
+        output = audio_processing.cache_path(song)
+        if output.exists() and not force:
+            results[song] = None
+            print(f"{song.name:<40} up to date")
+        else:
+            outputs[song] = output
+
+    if not outputs:
+        return results
+
+    with ProcessPoolExecutor(min(workers or os.cpu_count(), len(outputs))) as pool:
+        futures = {
+            pool.submit(compile_song, song, output): song
+            for song, output in outputs.items()
+        }
+        for future in as_completed(futures):
+            song = futures[future]
+            try:
+                results[song] = beats, seconds = future.result()
+            except Exception as error:
+                results[song] = error
+                print(f"{song.name:<40} failed: {error!r}")
+            else:
+                print(f"{song.name:<40} {beats:>5} beats in {seconds:6.2f} s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find the beats of every song.")
+    parser.add_argument(
+        "directory",
+        nargs="?",
+        type=Path,
+        help="where to look for songs (default: only the songs the levels play)",
+    )
+    parser.add_argument(
+        "--workers", type=int, help="how many songs to analyze at once (default: cores)"
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="analyze songs that are already cached"
+    )
+    args = parser.parse_args()
+
+    started = perf_counter()
+    songs = list(SONGS) if args.directory is None else find_songs(args.directory)
+    results = compile_songs(songs, args.workers, args.force)
+    compiled = [result for result in results.values() if isinstance(result, tuple)]
+    failed = [result for result in results.values() if isinstance(result, Exception)]
+    print(
+        f"Compiled {len(compiled)} of {len(results)} songs"
+        f" in {perf_counter() - started:.2f} s, {len(failed)} failed"
+    )
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
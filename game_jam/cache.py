@@ -0,0 +1,194 @@
+"""Caches that keep decoded assets in memory so they are only loaded once."""
+
+from collections import OrderedDict
+from pathlib import Path
+
+import pygame
+
+from .atlas import SPRITE_ATLAS
+
+# Roughly 64 MB of 32 bit pixels
+TEXTURE_MEMORY_LIMIT = 64 * 1024 * 1024
+# Scores change constantly, so only keep the most recent renders around
+RENDERED_TEXT_LIMIT = 256
+
+TextureKey = tuple[str, tuple[int, int] | None, float]
+TextKey = tuple[str, str, int, tuple[int, int, int]]
+
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    """The amount of memory a surface's pixels take up."""
+
+    return surface.get_bytesize() * surface.get_width() * surface.get_height()
+
+
+class TextureCache:
+    """
+    Holds every loaded image, keyed by its path, size, and rotation.
+
+    The least recently used textures are dropped once the total size of the
+    cached surfaces goes over the memory limit.
+    """
+
+    def __init__(self, memory_limit: int = TEXTURE_MEMORY_LIMIT):
+        """
+        :param memory_limit: The most bytes of pixel data to keep loaded at once.
+        """
+
+        self.memory_limit = memory_limit
+        self.memory_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._textures: OrderedDict[TextureKey, pygame.Surface] = OrderedDict()
+
+    def get(
+        self, path: Path | str, size: tuple[int, int] = None, angle: float = 0
+    ) -> pygame.Surface:
+        """
+        Returns the image at the path, scaled and rotated as requested.
+
+        :param path: The file path to the image.
+        :param size: The width and height to scale to, or None for the original size.
+        :param angle: The counterclockwise rotation of the image, in degrees.
+        """
+
+        key = (str(path), None if size is None else tuple(size), angle % 360)
+        texture = self._textures.get(key)
+        if texture is not None:
+            self.hits += 1
+            self._textures.move_to_end(key)
+            return texture
+
+        self.misses += 1
+        if angle % 360:
+            texture = pygame.transform.rotate(self.get(path, size), angle)
+        elif size is not None:
+            texture = pygame.transform.scale(self.get(path), size)
+        else:
+            texture = SPRITE_ATLAS.get(path)
+            if texture is None:
+                texture = pygame.image.load(path)
+                if pygame.display.get_surface() is not None:
+                    texture = texture.convert_alpha()
+
+        self._store(key, texture)
+        return texture
+
+    def get_size(self, path: Path | str) -> tuple[int, int]:
+        """
+        The original width and height of an image.
+
+        :param path: The file path to the image.
+        """
+
+        return self.get(path).get_size()
+
+    def clear(self) -> None:
+        """Forget every cached texture."""
+
+        self._textures.clear()
+        self.memory_used = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of lookups that didn't need to load anything."""
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __len__(self):
+        return len(self._textures)
+
+    def _store(self, key: TextureKey, texture: pygame.Surface) -> None:
+        self._textures[key] = texture
+        self.memory_used += surface_bytes(texture)
+
+        # Always keep the newest texture, even if it is bigger than the limit
+        while self.memory_used > self.memory_limit and len(self._textures) > 1:
+            _, evicted = self._textures.popitem(last=False)
+            self.memory_used -= surface_bytes(evicted)
+
+
+class TextCache:
+    """
+    Pools font objects by face and size and keeps recently rendered text.
+
+    Opening a font reads the font file, so each face and size is only opened once.
+    """
+
+    def __init__(self, limit: int = RENDERED_TEXT_LIMIT):
+        """
+        :param limit: The most rendered messages to keep at once.
+        """
+
+        self.limit = limit
+        self.hits = 0
+        self.misses = 0
+        self._fonts: dict[tuple[str, int], pygame.font.Font] = {}
+        self._rendered: OrderedDict[TextKey, pygame.Surface] = OrderedDict()
+
+    def get_font(self, size: int, face: str = None) -> pygame.font.Font:
+        """
+        Returns a shared font object.
+
+        :param size: The height of the font, in pixels.
+        :param face: The font file, or None for pygame's default font.
+        """
+
+        if face is None:
+            face = pygame.font.get_default_font()
+
+        font = self._fonts.get((face, size))
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self._fonts[face, size] = pygame.font.Font(face, size)
+        return font
+
+    def render(
+        self, message: str, size: int, color: tuple[int, int, int], face: str = None
+    ) -> pygame.Surface:
+        """
+        Returns the message drawn in the given font size and color.
+
+        :param message: The words to draw.
+        :param size: The height of the font, in pixels.
+        :param color: The RGB value of the text.
+        :param face: The font file, or None for pygame's default font.
+        """
+
+        key = (message, face or "", size, tuple(color))
+        text = self._rendered.get(key)
+        if text is not None:
+            self.hits += 1
+            self._rendered.move_to_end(key)
+            return text
+
+        self.misses += 1
+        text = self.get_font(size, face).render(
+            message.encode(encoding="UTF-8", errors="ignore"), True, color
+        )
+        self._rendered[key] = text
+        if len(self._rendered) > self.limit:
+            self._rendered.popitem(last=False)
+        return text
+
+    @property
+    def hit_rate(self) -> float:
+        """The fraction of renders that were already cached."""
+
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def clear(self) -> None:
+        """Forget every font and rendered message."""
+
+        self._fonts.clear()
+        self._rendered.clear()
+
+    def __len__(self):
+        return len(self._rendered)
+
+
+TEXTURES = TextureCache()
+TEXT = TextCache()
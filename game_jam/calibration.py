@@ -0,0 +1,196 @@
+"""
+A screen that measures how late sounds are heard, by tapping along to a click track.
+
+Clicks play at a steady tempo and the player taps the pad in time with what they hear.
+How late the taps are on average is the delay between the game playing a sound and the
+player hearing it, which levels make up for by spawning each jar that much later.
+"""
+
+import numpy as np
+import pygame
+
+from .constants import WIDTH
+from .events import open_window
+from .gui import Window, Text, TextButton
+from .mixer import OFFSET_SETTING, buffer_latency, get_offset
+from .settings import SETTINGS
+
+# Seconds between clicks, which is 100 beats per minute
+INTERVAL = 0.6
+# Clicks to get the tempo from before taps start counting
+LEAD_IN = 4
+# Clicks that taps are measured against
+CLICKS = 16
+# The fewest taps that make a trustworthy measurement
+MIN_TAPS = 8
+# Taps further than this from every click, in seconds, were probably mistakes
+MAX_OFFSET = INTERVAL / 2
+
+
+def make_click(pitch: float = 1000, duration: float = 0.03) -> pygame.mixer.Sound:
+    """
+    A short beep that fades out quickly, in whatever format the mixer uses.
+
+    :param pitch: The frequency of the beep, in hertz.
+    :param duration: How long the beep lasts, in seconds.
+    """
+
+    frequency, size, channels = pygame.mixer.get_init()
+    times = np.arange(int(frequency * duration)) / frequency
+    wave = 0.8 * np.sin(2 * np.pi * pitch * times) * np.exp(-5 * times / duration)
+
+    bits = abs(size)
+    if bits == 32:
+        samples = wave.astype(np.float32)
+    else:
+        peak = 2 ** (bits - 1) - 1
+        # Unsigned formats are centered halfway up instead of on zero
+        center = peak + 1 if size > 0 else 0
+        kind = "u" if size > 0 else "i"
+        samples = (wave * peak + center).astype(f"{kind}{bits // 8}")
+
+    if channels > 1:
+        samples = np.repeat(samples[:, np.newaxis], channels, axis=1)
+    return pygame.sndarray.make_sound(np.ascontiguousarray(samples))
+
+
+def measure_offset(clicks: list[float], taps: list[float]) -> float | None:
+    """
+    How late the taps were compared to the clicks they were closest to, in seconds.
+
+    :param clicks: When each click was played.
+    :param taps: When each tap happened.
+    :returns: The median delay, or None if too few taps were close to a click.
+    """
+
+    if not clicks:
+        return None
+
+    clicks = np.asarray(clicks)
+    taps = np.asarray(taps)
+    nearest = np.abs(taps[:, np.newaxis] - clicks).argmin(axis=1)
+    offsets = taps - clicks[nearest]
+    offsets = offsets[np.abs(offsets) <= MAX_OFFSET]
+    if len(offsets) < MIN_TAPS:
+        return None
+    return float(np.median(offsets))
+
+
+class CalibrationScreen(Window):
+    """Plays a click track and works out the audio delay from the player's taps."""
+
+    def __init__(self, game, background=None):
+        """
+        :param game: The Game object that this window belongs to.
+        :param background: The file path to the background image.
+        """
+
+        super().__init__(
+            background,
+            {
+                "Instructions": Text(
+                    "Press Start, then tap along with the clicks",
+                    (WIDTH // 2 - 450, 80, 900, 80),
+                    font_size=40,
+                ),
+                "Pad": TextButton(
+                    "Tap",
+                    (WIDTH // 2 - 150, 200, 300, 250),
+                    font_size=75,
+                    on_click=self.tap,
+                ),
+                "Result": Text(
+                    "",
+                    (WIDTH // 2 - 250, 490, 500, 50),
+                ),
+                "Start": TextButton(
+                    "Start",
+                    (WIDTH // 2 - 325, 580, 200, 50),
+                    on_click=self.start,
+                ),
+                "Reset": TextButton(
+                    "Reset",
+                    (WIDTH // 2 - 100, 580, 200, 50),
+                    on_click=self.reset,
+                ),
+                "Back": TextButton(
+                    "Back",
+                    (WIDTH // 2 + 125, 580, 200, 50),
+                    on_click=open_window(game, "Settings"),
+                ),
+            },
+        )
+        self.game = game
+        self.measuring = False
+        self._click = None
+        self._next_click = None
+        self._played = 0
+        self._clicks: list[float] = []
+        self._taps: list[float] = []
+        self.show_offset()
+
+    def start(self) -> None:
+        """Start the click track over, forgetting any taps so far."""
+
+        if self._click is None:
+            self._click = make_click()
+        self.measuring = True
+        self._next_click = self.game.now + INTERVAL
+        self._played = 0
+        self._clicks = []
+        self._taps = []
+        self.get_element("Pad").message = "Listen..."
+
+    def tap(self) -> None:
+        """Remember when the pad was tapped."""
+
+        # Taps along with the lead in are too far from the measured clicks to count
+        if self.measuring:
+            # The tap happened some time since the last frame started, so count it as
+            # halfway through, rather than at the start of the frame that handled it
+            self._taps.append(self.game.now - self.game.frame_time / 2)
+
+    def reset(self) -> None:
+        """Stop measuring, and go back to not making up for any delay."""
+
+        self.measuring = False
+        SETTINGS.set(OFFSET_SETTING, 0.0)
+        self.get_element("Pad").message = "Tap"
+        self.show_offset()
+
+    def finish(self) -> None:
+        """Work out the delay from the taps, and save it if there were enough."""
+
+        self.measuring = False
+        self.get_element("Pad").message = "Tap"
+        offset = measure_offset(self._clicks, self._taps)
+        if offset is None:
+            self.get_element("Result").message = "Not enough taps, try again"
+            return
+
+        SETTINGS.set(OFFSET_SETTING, round(offset, 3))
+        self.show_offset()
+
+    def show_offset(self) -> None:
+        """Show the delay being made up for, and the part the mixer's buffer adds."""
+
+        self.get_element("Result").message = (
+            f"Delay: {get_offset() * 1000:.0f} ms "
+            f"(buffer {buffer_latency() * 1000:.0f} ms)"
+        )
+
+    def on_update(self):
+        if not self.measuring or self.game.now < self._next_click:
+            return
+
+        if self._played == LEAD_IN + CLICKS:
+            # Wait one more beat for the last tap, then stop
+            self.finish()
+            return
+
+        self._click.play()
+        if self._played >= LEAD_IN:
+            self._clicks.append(self.game.now)
+            self.get_element("Pad").message = f"Tap! {CLICKS - len(self._clicks)}"
+        self._played += 1
+        self._next_click += INTERVAL
@@ -0,0 +1,107 @@
+"""Sources of time for the game loop."""
+
+from time import perf_counter
+
+import pygame
+
+from .constants import TIMESTEP
+
+
+class FrameClock:
+    """Real time, which waits between frames to keep a steady frame rate."""
+
+    # Whether work done in the background keeps up with the clock
+    realtime = True
+
+    def __init__(self):
+        self._clock = pygame.time.Clock()
+
+    def tick(self, framerate: int) -> int:
+        """
+        Wait until it's time for the next frame.
+
+        :param framerate: The most frames to allow per second.
+        :returns: How many milliseconds passed since the last tick.
+        """
+
+        return self._clock.tick(framerate)
+
+    @staticmethod
+    def time() -> float:
+        """The current time, in seconds."""
+
+        return perf_counter()
+
+
+class VirtualClock:
+    """
+    Time that only passes when a frame is ticked, by the same amount every frame.
+
+    The game behaves the same however fast or slow the computer running it is,
+    so runs can be repeated and compared.
+    """
+
+    # Frames can pass faster than background work, so it has to be done in between
+    realtime = False
+
+    def __init__(self, frame_time: float = TIMESTEP):
+        """
+        :param frame_time: How many seconds pass each frame.
+        """
+
+        self.frame_time = frame_time
+        self.frames = 0
+
+    def tick(self, framerate: int = 0) -> int:
+        """
+        Move on to the next frame without waiting.
+
+        :param framerate: Ignored, since frames always take `frame_time`.
+        :returns: How many milliseconds passed since the last tick.
+        """
+
+        self.frames += 1
+        return round(self.frame_time * 1000)
+
+    def time(self) -> float:
+        """How many seconds of frames have passed."""
+
+        return self.frames * self.frame_time
+
+
+class ReplayClock:
+    """
+    Time that steps through the frame times of a recording, one per tick, so a
+    replay sees exactly the times the recorded session did.
+    """
+
+    realtime = False
+
+    def __init__(self, start: float, times: list[float]):
+        """
+        :param start: The time before the first frame.
+        :param times: The time of each frame, in order.
+        """
+
+        self.start = start
+        self.times = times
+        self.frames = 0
+
+    def tick(self, framerate: int = 0) -> int:
+        """
+        Move on to the next recorded frame without waiting.
+
+        :param framerate: Ignored, since frames take as long as they were recorded.
+        :returns: How many milliseconds passed since the last tick.
+        """
+
+        previous = self.time()
+        self.frames += 1
+        return round((self.time() - previous) * 1000)
+
+    def time(self) -> float:
+        """The time of the current recorded frame."""
+
+        if self.frames == 0:
+            return self.start
+        return self.times[min(self.frames, len(self.times)) - 1]
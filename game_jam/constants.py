@@ -3,7 +3,7 @@
 from pathlib import Path
 from typing import Callable
 
-import pygame
+from .display import get_screen, get_size
 
 NAME = "JellySmash"
 
@@ -12,17 +12,35 @@ ROOT = GAME_JAM.parent
 ASSETS = ROOT / "assets"
 SPRITES = ASSETS / "sprites"
 SOUNDS = ASSETS / "sounds"
+# Every song a level plays, which are the only sounds whose beats are needed
+SONGS = (
+    SOUNDS / "ode-to-joy.ogg",
+    SOUNDS / "rushE.ogg",
+    SOUNDS / "gamemusic-6082.ogg",
+)
 
-pygame.display.init()
-WIDTH = pygame.display.Info().current_w
-HEIGHT = pygame.display.Info().current_h
-SCREEN = pygame.display.set_mode((WIDTH, HEIGHT), pygame.HWSURFACE)
+WIDTH, HEIGHT = get_size()
 
 FPS = 60
+# Seconds of gameplay simulated by each update, no matter how fast frames are drawn
+TIMESTEP = 1 / FPS
+# Longest time a single frame can catch up on, so a long stall can't freeze the game
+MAX_FRAME_TIME = 0.25
 FRAMES_PER_ANIMATION = 5
+# How far down the screen a jar is when its beat plays
+HIT_LINE = 3 / 4
+# Redraw the whole screen once more than this fraction of it has changed
+DIRTY_AREA_LIMIT = 0.5
 
 # Type hints
 Coordinate = tuple[int, int]
 RGB = tuple[int, int, int]
 Rect = tuple[int, int, int, int]
 Function = Callable[[], None]
+
+
+def __getattr__(name):
+    # The window is only opened once something asks for it
+    if name == "SCREEN":
+        return get_screen()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,209 @@
+"""
+The game window, which isn't opened until something is first drawn to it.
+
+Everything is drawn to a screen at the same logical size on every monitor, which is
+scaled to fit the window. Drawing costs the same however many pixels the monitor has,
+and the layout never changes. Nearest scaling only scales the parts of the screen that
+changed, while smooth scaling blends neighboring pixels, so it scales the whole screen
+whenever anything changes.
+"""
+
+import numpy as np
+import pygame
+
+# Everything is laid out and drawn at this size
+LOGICAL_SIZE = (1366, 768)
+# Used when there is no screen to measure, like when running without a display
+DEFAULT_SIZE = LOGICAL_SIZE
+
+# The ways the screen can be scaled to the window
+SCALERS = {
+    "nearest": pygame.transform.scale,
+    "smooth": pygame.transform.smoothscale,
+}
+# Smooth until frames take too long, then nearest until there's time to spare again
+DYNAMIC = "dynamic"
+SCALING_PRESETS = ("nearest", "smooth", DYNAMIC)
+
+# In dynamic scaling, the longest a frame should take to process, in seconds
+FRAME_BUDGET = 1 / 60
+# How much each frame counts towards the average frame time in dynamic scaling
+SMOOTHING = 0.05
+
+# The size of the window, or None to fill the monitor
+window_size: tuple[int, int] | None = None
+
+_window: pygame.Surface | None = None
+_screen: pygame.Surface | None = None
+_viewport: pygame.Rect | None = None
+# The column and row of the screen shown at each column and row of the viewport
+_columns: np.ndarray | None = None
+_rows: np.ndarray | None = None
+_scaling = "nearest"
+_scaler = "nearest"
+# The scaler the window was last drawn with, to redraw all of it when that changes
+_presented_scaler = None
+_average_frame_time = 0.0
+
+
+def get_size() -> tuple[int, int]:
+    """The width and height everything is drawn at."""
+
+    return LOGICAL_SIZE
+
+
+def get_monitor_size() -> tuple[int, int]:
+    """The width and height of the monitor, found without opening a window."""
+
+    try:
+        if not pygame.display.get_init():
+            pygame.display.init()
+        info = pygame.display.Info()
+    except pygame.error:
+        return DEFAULT_SIZE
+
+    if info.current_w <= 0 or info.current_h <= 0:
+        return DEFAULT_SIZE
+    return info.current_w, info.current_h
+
+
+def get_screen() -> pygame.Surface:
+    """The surface to draw on, opening the window the first time it's needed."""
+
+    global _window, _screen, _viewport, _columns, _rows
+    if _screen is None:
+        _window = pygame.display.set_mode(
+            window_size or get_monitor_size(), pygame.HWSURFACE
+        )
+        if _window.get_size() == LOGICAL_SIZE:
+            # Nothing to scale, so draw straight to the window
+            _screen = _window
+            _viewport = _window.get_rect()
+        else:
+            _screen = pygame.Surface(LOGICAL_SIZE).convert()
+            _viewport = fit(LOGICAL_SIZE, _window.get_rect())
+            # The same pixels pygame.transform.scale picks, so parts of the screen
+            # scaled on their own line up with the rest of it
+            _columns = np.arange(_viewport.width) * LOGICAL_SIZE[0] // _viewport.width
+            _rows = np.arange(_viewport.height) * LOGICAL_SIZE[1] // _viewport.height
+            _window.fill((0, 0, 0))
+    return _screen
+
+
+def fit(size: tuple[int, int], area: pygame.Rect) -> pygame.Rect:
+    """
+    The biggest rectangle with the same shape as a size that fits in the middle of an
+    area, leaving black bars on the sides that don't fit.
+
+    :param size: The width and height to keep the shape of.
+    :param area: The area to fit inside.
+    """
+
+    scale = min(area.width / size[0], area.height / size[1])
+    rect = pygame.Rect(0, 0, round(size[0] * scale), round(size[1] * scale))
+    rect.center = area.center
+    return rect
+
+
+def present(rects: list[pygame.Rect] | None = None) -> None:
+    """
+    Show what was drawn this frame in the game window.
+
+    :param rects: The areas of the screen that changed, or None to show all of it.
+    """
+
+    global _presented_scaler
+    if _screen is _window:
+        if rects is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(rects)
+        return
+
+    if rects is not None and not rects:
+        return
+    # Whole pixels are copied at once, which can't be done with three bytes per pixel
+    if (
+        rects is None
+        or _scaler != "nearest"
+        or _presented_scaler != _scaler
+        or _screen.get_bytesize() == 3
+    ):
+        SCALERS[_scaler](_screen, _viewport.size, _window.subsurface(_viewport))
+        pygame.display.update()
+        _presented_scaler = _scaler
+        return
+
+    pixels = pygame.surfarray.pixels2d(_screen)
+    updated = []
+    for rect in rects:
+        rect = rect.clip(_screen.get_rect())
+        left, right = np.searchsorted(_columns, (rect.left, rect.right))
+        top, bottom = np.searchsorted(_rows, (rect.top, rect.bottom))
+        if left == right or top == bottom:
+            continue
+        area = pygame.Rect(
+            _viewport.x + left, _viewport.y + top, right - left, bottom - top
+        )
+        pygame.surfarray.blit_array(
+            _window.subsurface(area),
+            pixels[_columns[left:right, np.newaxis], _rows[np.newaxis, top:bottom]],
+        )
+        updated.append(area)
+    del pixels
+    pygame.display.update(updated)
+
+
+def to_logical(position: tuple[int, int]) -> tuple[int, int]:
+    """
+    Where a point in the window is on the screen that's drawn to.
+
+    :param position: The point in the window, like where the mouse clicked.
+    """
+
+    if _viewport is None or _screen is _window:
+        return position
+    return (
+        int((position[0] - _viewport.x) * LOGICAL_SIZE[0] / _viewport.width),
+        int((position[1] - _viewport.y) * LOGICAL_SIZE[1] / _viewport.height),
+    )
+
+
+def set_scaling(preset: str) -> None:
+    """
+    Choose how the screen is scaled to fit the window.
+
+    :param preset: One of `SCALING_PRESETS`.
+    """
+
+    global _scaling, _scaler
+    if preset not in SCALING_PRESETS:
+        raise ValueError(f"{preset!r} is not one of {SCALING_PRESETS}")
+
+    _scaling = preset
+    _scaler = "smooth" if preset == DYNAMIC else preset
+
+
+def get_scaling() -> str:
+    """The scaling preset being used."""
+
+    return _scaling
+
+
+def adjust_scaling(frame_time: float) -> None:
+    """
+    With dynamic scaling, switch to the cheaper scaler while frames take too long,
+    and back once they're well under budget.
+
+    :param frame_time: How long the last frame took to process, in seconds.
+    """
+
+    global _average_frame_time, _scaler
+    _average_frame_time += SMOOTHING * (frame_time - _average_frame_time)
+    if _scaling != DYNAMIC:
+        return
+
+    if _average_frame_time > FRAME_BUDGET:
+        _scaler = "nearest"
+    elif _average_frame_time < FRAME_BUDGET / 2:
+        _scaler = "smooth"
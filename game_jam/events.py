@@ -1,13 +1,12 @@
 """Events that are triggered for a specific object every frame."""
 
-import json
-
 import pygame
 
-from .constants import GAME_JAM, Function, FRAMES_PER_ANIMATION, HEIGHT, SPRITES
+from .constants import Function
+from .display import SCALING_PRESETS
 from .gui import Window, Element
-
-SETTINGS = GAME_JAM / "settings.json"
+from .settings import SETTINGS
+from .sound_bank import EFFECTS
 
 
 def get_window(game, window_name) -> Window:
@@ -52,10 +51,8 @@ def get_settings() -> dict[str:float]:
     """
     Gives a dictionary of the settings file.
     """
-    
-    with SETTINGS.open() as file:
-        data = json.load(file)
-    return data
+
+    return dict(SETTINGS.data)
 
 
 def get_value(key: str) -> float:
@@ -65,7 +62,7 @@ def get_value(key: str) -> float:
     :param key: The setting to retrieve the value from.
     """
 
-    return get_settings().get(key)
+    return SETTINGS.get(key)
 
 
 def set_setting(key: str, value: float) -> None:
@@ -81,10 +78,17 @@ def set_setting(key: str, value: float) -> None:
     elif value > 1:
         value = 1
 
-    data = get_settings()
-    data[key] = value
-    with SETTINGS.open("w") as file:
-        json.dump(data, file)
+    SETTINGS.set(key, value)
+
+
+def prefetch_levels(game, window_names: list[str]) -> Function:
+    """Start loading levels in the background so they are ready when picked."""
+
+    def inner():
+        for name in window_names:
+            get_window(game, name).prefetch()
+
+    return inner
 
 
 def exit_game(game) -> Function:
@@ -101,7 +105,7 @@ def increase_volume(volume_type: str) -> Function:
 
     def inner():
         key = f"{volume_type} Volume"
-        old_volume = get_settings().get(key)
+        old_volume = get_value(key)
         new_volume = min(old_volume + 0.1, 1)
         set_setting(key, new_volume)
 
@@ -113,7 +117,7 @@ def decrease_volume(volume_type: str) -> Function:
 
     def inner():
         key = f"{volume_type} Volume"
-        old_volume = get_settings().get(key)
+        old_volume = get_value(key)
         new_volume = min(old_volume - 0.1, 1)
         set_setting(key, new_volume)
 
@@ -125,7 +129,7 @@ def reset_volume(volume_type: str) -> Function:
 
     def inner():
         key = f"{volume_type} Volume"
-        old_volume = get_settings().get(key)
+        old_volume = get_value(key)
         new_volume = 0
         if old_volume == 0:
             new_volume = 0.5
@@ -134,6 +138,28 @@ def reset_volume(volume_type: str) -> Function:
     return inner
 
 
+def cycle_scaling() -> Function:
+    """Switch to the next way of scaling the screen to fit the window."""
+
+    def inner():
+        preset = get_value("Scaling") or SCALING_PRESETS[0]
+        index = (SCALING_PRESETS.index(preset) + 1) % len(SCALING_PRESETS)
+        SETTINGS.set("Scaling", SCALING_PRESETS[index])
+
+    return inner
+
+
+def update_scaling(game, window_name: str) -> Function:
+    """Makes the scaling button in settings show the current preset."""
+
+    def inner():
+        preset = get_value("Scaling") or SCALING_PRESETS[0]
+        elem = get_element(game, window_name, "Scaling")
+        elem.message = f"Scaling: {preset.capitalize()}"
+
+    return inner
+
+
 def update_volume(game, window_name: str, volume_type: str) -> Function:
     """Makes the buttons in settings display the volume in real time."""
 
@@ -150,10 +176,9 @@ def toggle_paused(level) -> Function:
 
     def inner():
         if level.running:
-            pygame.mixer.music.pause()
+            level.pause()
         else:
-            pygame.mixer.music.unpause()
-        level.running = not level.running
+            level.resume()
 
     return inner
 
@@ -165,39 +190,29 @@ def update_scoreboard(level):
     return inner
 
 
-def update_jar(level, jar, y: int):
-    """Move the element down by the specified amount."""
+def update_jars(level, y: float):
+    """Move every jar down by the specified amount."""
 
-    def inner(jar=jar):
-        jar.move(0, y)
-        if jar.center[1] > HEIGHT and not jar.broken:
+    def inner():
+        jars = level.elements.get("Jars")
+        for jar in jars.fall(y):
             smash(level, jar)
-            if "pickle" not in str(jar.path):
+            if not jars.is_pickle(jar):
                 level.lose_life()
 
-        if jar.broken:
-            if jar.broken > 3 * FRAMES_PER_ANIMATION:
-                jars = level.elements.get("Jars")
-                jars.remove(jar)
-                del jar
-            else:
-                filename = str(jar.path).rsplit("/", maxsplit=1)[-1]
-                color = filename[: filename.index("J")]
-                jar.path = (
-                    SPRITES / f"{color}JarSmash{jar.broken // FRAMES_PER_ANIMATION}.png"
-                )
-                jar.broken += 1
+        jars.animate()
 
     return inner
 
 
-def smash_jar(level, jar):
-    """Destroy a given jar."""
+def smash_jars(level):
+    """Destroy every jar under a click."""
 
-    def inner():
-        if not jar.broken:
+    def inner(position):
+        jars = level.elements.get("Jars")
+        for jar in jars.at(position):
             smash(level, jar)
-            if "pickle" in str(jar.path):
+            if jars.is_pickle(jar):
                 level.lose_life()
             else:
                 level.score += 100
@@ -205,12 +220,9 @@ def smash_jar(level, jar):
     return inner
 
 
-def smash(level, jar):
+def smash(level, jar: int):
     """Destroy a jar."""
 
-    smash_sound = pygame.mixer.Sound(level.smash_sound)
-    volume = get_value("Effects Volume")
-    smash_sound.set_volume(volume)
-    smash_sound.play()
+    EFFECTS.play("smash")
 
-    jar.broken = FRAMES_PER_ANIMATION
+    level.elements.get("Jars").smash(jar)
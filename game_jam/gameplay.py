@@ -1,21 +1,34 @@
 """Classes and elements that will appear during the gameplay itself."""
 
 import asyncio
+import io
+import itertools
 import random
-from time import perf_counter
+import struct
+import zlib
+from concurrent.futures import Future
+from pathlib import Path
 
 import pygame
 
 from . import audio_processing
-from .constants import WIDTH, HEIGHT, SOUNDS, SPRITES, SCREEN
-from .events import get_value, toggle_paused, update_scoreboard, update_jar, smash_jar
-from .gui import Window, Button, get_sprite_height, Text
+from .atlas import SPRITE_ATLAS
+from .constants import WIDTH, HEIGHT, HIT_LINE, SOUNDS, SPRITES, TIMESTEP
+from .events import get_value, toggle_paused, update_scoreboard, update_jars, smash_jars
+from .gui import STATIC, Window, Button, get_sprite_height, Text
+from .jars import COLORS, SPARE_JARS, JarField, peak_jars
+from .lifecycle import ACTIVE, ENTERED, EXITED, LOADED, PAUSED, UNLOADED, TaskSupervisor
+from .loader import LOADER
+from .mixer import get_offset
+from .scheduler import BeatScheduler, RecordedBeats, SongClock
+from .sound_bank import EFFECTS
+from .streaming import BeatStream
 
 
 class Level(Window):
     """The class for making individual levels."""
 
-    def __init__(self, game, song, speed=5):
+    def __init__(self, game, song, speed=300):
         """
         :param game: The Game object that this level belongs to.
         :param song: The path to the song that should play in the background.
@@ -29,9 +42,15 @@ class Level(Window):
 
         self.score = None
         self.running = None
-        self._last_click = None
-        self._task = None
+        self.stage = UNLOADED
+        self.tasks = TaskSupervisor(type(self).__name__ if song is None else song.stem)
         self.timestamps = None
+        self.beats = None
+        # Only moves on between frames, so the level plays out the same on replay
+        self.clock = SongClock(lambda: game.now)
+        self.random = random.Random()
+        self._assets: dict[str, Future] = {}
+        self._asset_paths: list[Path] = []
 
         self.smash_sound = SOUNDS / "smashing_glass.ogg"
 
@@ -41,9 +60,12 @@ class Level(Window):
                 (1080 * WIDTH // 1336, 598 * HEIGHT // 768),
                 scale=2.5,
                 on_click=toggle_paused(self),
+                layer=STATIC,
             ),
             "Lives": [],
-            "Jars": [],
+            "Jars": JarField(
+                [(30 + lane * 9) * WIDTH // 103 for lane in range(5)]
+            ),
             "Score board": Text(
                 message=str(self.score),
                 position=(
@@ -60,76 +82,268 @@ class Level(Window):
                 (29 * WIDTH // 103, 0),
                 0,
                 scale=(HEIGHT / get_sprite_height("belt.png")),
+                layer=STATIC,
             ),
             "Belt Two": Button(
                 SPRITES / "belt.png",
                 (38 * WIDTH // 103, 0),
                 0,
                 scale=(HEIGHT / get_sprite_height("belt.png")),
+                layer=STATIC,
             ),
             "Belt Three": Button(
                 SPRITES / "belt.png",
                 (47 * WIDTH // 103, 0),
                 0,
                 scale=(HEIGHT / get_sprite_height("belt.png")),
+                layer=STATIC,
             ),
             "Belt Four": Button(
                 SPRITES / "belt.png",
                 (56 * WIDTH // 103, 0),
                 0,
                 scale=(HEIGHT / get_sprite_height("belt.png")),
+                layer=STATIC,
             ),
             "Belt Five": Button(
                 SPRITES / "belt.png",
                 (65 * WIDTH // 103, 0),
                 0,
                 scale=(HEIGHT / get_sprite_height("belt.png")),
+                layer=STATIC,
             ),
         }
 
+    def prefetch(self) -> list[Future]:
+        """
+        Start loading the song, beatmap, images, and sounds in the background.
+
+        :returns: The futures of everything being loaded.
+        """
+
+        if not self._assets:
+            requests = {"smash": (LOADER.sound, self.smash_sound)}
+            if self.song is not None:
+                requests["beats"] = (LOADER.beats, self.song)
+                requests["song"] = (LOADER.data, self.song)
+            if self._background is None:
+                requests["background"] = (LOADER.image, self.background_path)
+            for sheet, path in SPRITE_ATLAS.unloaded_sheets.items():
+                requests[f"sheet {sheet}"] = (LOADER.image, path)
+
+            self._assets = {name: load(path) for name, (load, path) in requests.items()}
+            self._asset_paths = [path for _, path in requests.values()]
+        return list(self._assets.values())
+
+    @property
+    def ready(self) -> bool:
+        """Whether everything the level needs has loaded, so it can start right away."""
+
+        return bool(self._assets) and all(
+            future.done() for future in self._assets.values()
+        )
+
     def load(self) -> None:
-        """Loads in a Level. Resets old progress, if there is any."""
+        """Use everything that was loaded ahead of time, unless it's already loaded."""
+
+        if self.stage != UNLOADED:
+            return
+
+        # Unloading forgets what was prefetched, so it may need loading again
+        self.prefetch()
+        assets = {name: future.result() for name, future in self._assets.items()}
+        if "background" in assets:
+            self.set_background(assets["background"])
+        for name, image in assets.items():
+            if name.startswith("sheet "):
+                SPRITE_ATLAS.add_sheet(int(name.removeprefix("sheet ")), image)
+        EFFECTS.load("smash", self.smash_sound, assets["smash"])
+        self.stage = LOADED
+
+    def enter(self, seed: int = None) -> None:
+        """
+        Start playing the level from the beginning. Resets old progress, if there is
+        any.
+
+        :param seed: The seed for choosing jar colors and belts.
+        """
+
+        self.exit()
+        self.load()
+        assets = {name: future.result() for name, future in self._assets.items()}
 
         self.score = 0
         self.running = True
-        self._last_click = None
+        self.random.seed(seed)
+
+        jars = self.elements["Jars"]
+        jars.clear()
+        jars.on_update = update_jars(self, self.speed * TIMESTEP)
+        jars.on_click = smash_jars(self)
 
-        self.elements["Jars"] = []
         self.elements["Lives"] = [
             Button(
                 SPRITES / "redHeart.png",
                 (38 * WIDTH // 1336, 65 * HEIGHT // 768),
                 scale=3,
+                layer=STATIC,
             ),
             Button(
                 SPRITES / "redHeart.png",
                 (143 * WIDTH // 1336, 65 * HEIGHT // 768),
                 scale=3,
+                layer=STATIC,
             ),
             Button(
                 SPRITES / "redHeart.png",
                 (250 * WIDTH // 1336, 65 * HEIGHT // 768),
                 scale=3,
+                layer=STATIC,
             ),
         ]
 
-        self.timestamps = audio_processing.get_each_note(self.song)
+        if self.game.replay is None:
+            self.load_beats(assets)
+        else:
+            self.load_recorded_beats(self.game.replay)
+        self.load_music(assets)
+
+        self.clock.start()
+        self.tasks.start(self.spawn_jars(), "spawn jars")
+        self.stage = ENTERED
+
+    def pause(self) -> None:
+        """Stop the music and the jars until the level is resumed."""
+
+        if self.stage != ENTERED:
+            return
+        pygame.mixer.music.pause()
+        self.clock.pause()
+        self.running = False
+        self.stage = PAUSED
+
+    def resume(self) -> None:
+        """Carry on after being paused."""
+
+        if self.stage != PAUSED:
+            return
+        pygame.mixer.music.unpause()
+        self.clock.resume()
+        self.running = True
+        self.stage = ENTERED
+
+    def exit(self) -> None:
+        """Stop playing, and cancel everything the level started."""
 
-        pygame.mixer.init()
-        pygame.mixer.music.load(self.song)
+        if self.stage not in ACTIVE:
+            return
+        self.tasks.cancel()
+        pygame.mixer.music.stop()
+        self.running = False
+        self.stage = EXITED
+
+    def unload(self) -> None:
+        """
+        Let go of the song, background, and jars until the level is loaded again,
+        including what was loaded ahead of time.
+        """
+
+        self.exit()
+        pygame.mixer.music.unload()
+        self._assets = {}
+        for path in self._asset_paths:
+            LOADER.forget(path)
+        self._background = None
+        self._static_layer = None
+        self._static_rects = {}
+        self._on_screen = {}
+        self.elements["Jars"].clear()
+        self.timestamps = None
+        self.beats = None
+        self.stage = UNLOADED
+
+    def resources(self) -> dict[str, int | str]:
+        """How much the level is holding on to, for finding leaks."""
+
+        jars = self.elements["Jars"]
+        return {
+            "stage": self.stage,
+            "tasks": len(self.tasks),
+            "surfaces": len(self.surfaces()),
+            "jars": len(jars),
+            "jar_capacity": jars.capacity,
+            "beats_left": 0 if self.beats is None else len(self.beats),
+            "assets": len(self._assets),
+            "cached_assets": sum(path in LOADER for path in self._asset_paths),
+        }
+
+    def load_beats(self, assets: dict) -> None:
+        """
+        Get ready to spawn a jar on every beat of the song.
+
+        :param assets: Everything that was loaded ahead of time, by name.
+        """
+
+        if "beats" in assets:
+            beats = assets["beats"]
+        else:
+            beats = audio_processing.get_each_note(self.song)
+        # Land each jar when its beat is heard, rather than when it's played
+        self.timestamps = (beats + get_offset()).tolist()
+        self.beats = BeatScheduler(self.timestamps, self.lead_time)
+
+        jars = self.elements["Jars"]
+        jars.reserve(
+            peak_jars(self.timestamps, jars.lifetime(self.speed)) + SPARE_JARS
+        )
+
+    def load_recorded_beats(self, session) -> None:
+        """
+        Get ready to spawn a jar on every beat a recording spawned one on.
+
+        :param session: The recording being played back.
+        """
+
+        self.timestamps = [beat for beat, _ in session.beats]
+        self.beats = RecordedBeats(
+            session.beats, self.lead_time, complete=session.score is not None
+        )
+
+        jars = self.elements["Jars"]
+        jars.reserve(
+            peak_jars(self.timestamps, jars.lifetime(self.speed)) + SPARE_JARS
+        )
+
+    def load_music(self, assets: dict) -> None:
+        """
+        Start playing the song.
+
+        :param assets: Everything that was loaded ahead of time, by name.
+        """
+
+        if "song" in assets:
+            pygame.mixer.music.load(io.BytesIO(assets["song"]), self.song.suffix[1:])
+        else:
+            pygame.mixer.music.load(self.song)
 
         volume = get_value("Song Volume")
         pygame.mixer.music.set_volume(volume)
 
         pygame.mixer.music.play()
-        self._task = asyncio.create_task(self.spawn_jars())
+
+    def update_music(self, position: float) -> None:
+        """
+        Keep the music in time with the level.
+
+        :param position: How far into the level playback is, in seconds.
+        """
 
     def close(self) -> None:
         """Exit the game onto the game over screen."""
 
-        pygame.mixer.music.stop()
-        self._task = None
-        self.running = False
+        self.exit()
+        if self.game.recorder is not None:
+            self.game.recorder.end(self.score)
         self.game.open("Game Over")
 
     def lose_life(self) -> None:
@@ -149,82 +363,186 @@ class Level(Window):
     def update_elements(self, game) -> None:
         """Updates each element every frame."""
 
-        for name, element in self.elements.items():
-            if name == "Lives":
-                continue
-            if name == "Jars":
-                continue
+        elements = [
+            element
+            for name, element in self.elements.items()
+            if name not in ("Lives", "Jars")
+        ]
+        for element in elements:
             element.on_update()
-            if element.is_pressed:
-                if self._last_click is None or perf_counter() - self._last_click > 0.2:
-                    element.on_click()
-                    self._last_click = perf_counter()
 
-        if not self.running:
-            return
-
-        jars: list = self.elements.get("Jars")
-        for jar in jars:
-            jar.on_update()
-            if jar.is_pressed:
-                jar.on_click()
+        jars = self.elements.get("Jars")
+        if self.running:
+            jars.on_update()
 
-    def display_elements(self):
-        """Display each element every frame."""
+        # Jars are drawn on top of everything else, so they get clicked first
+        for position in game.mouse.pop_clicks():
+            if self.running and jars.collides(position):
+                jars.on_click(position)
+            elif not self.click(game, position, elements):
+                break
 
-        SCREEN.blit(self._background, (0, 0))
+    def drawables(self) -> list:
+        """Every element to display, from back to front."""
 
-        for element in (
+        return (
             [
                 element
                 for name, element in self.elements.items()
                 if name not in ("Lives", "Jars")
             ]
             + self.elements.get("Lives")
-            + self.elements.get("Jars")
-        ):
-            element.show()
+            + [self.elements.get("Jars")]
+        )
 
-        pygame.display.update()
+    @property
+    def lead_time(self) -> float:
+        """How many seconds it takes a jar to fall to the hit line."""
 
-    async def spawn_jars(self):
-        """Generate the next jar in a random position in sync with the song."""
+        return HIT_LINE * HEIGHT / self.speed
+
+    def checksum(self) -> int:
+        """A checksum of the score, lives, and jars, to tell if two runs match."""
+
+        jars = self.elements["Jars"]
+        n = len(jars)
+        checksum = zlib.crc32(
+            struct.pack("<qi", self.score or 0, len(self.elements["Lives"]))
+        )
+        for array in (jars.left, jars.top, jars.lane, jars.color, jars.broken):
+            checksum = zlib.crc32(array[:n].tobytes(), checksum)
+        return checksum
+
+    def spawn_jar(self, late: float = 0) -> int:
+        """
+        Add a jar of a random color to a random belt.
 
-        jars: list = self.elements.get("Jars")
+        :param late: How many seconds ago the jar should have appeared. It starts
+            lower down to make up for it.
+        :returns: The index of the new jar.
+        """
+
+        n = 3
+        color = self.random.choices(
+            # Each color is n times more likely than a pickle
+            range(len(COLORS)),
+            (1, n, n, n),
+        )[0]
+        return self.elements.get("Jars").spawn(
+            self.random.randint(0, 4), color, late * self.speed
+        )
+
+    async def spawn_jars(self):
+        """Generate jars in random positions in sync with the song."""
 
         while True:
             if self.running:
-                n = 3
-                filename = random.choices(
-                    # Each color is n times more likely than a pickle
-                    ("pickle", "red", "purple", "magenta"),
-                    (1, n, n, n),
-                )[0]
-                jar = Button(
-                    SPRITES / f"{filename}Jar.png",
-                    ((30 + (random.randint(0, 4) * 9)) * WIDTH // 103, 0),
-                )
-
-                jar.on_update = update_jar(self, jar, self.speed)
-                jar.on_click = smash_jar(self, jar)
-                jars.append(jar)
-
-                notes = len(self.timestamps)
-                sleep_time = 0
-                if notes >= 2:
-                    sleep_time = self.timestamps[1] - self.timestamps[0]
-                elif notes == 1:
-                    sleep_time = self.timestamps[0]
-                else:
+                position = self.clock.position
+                self.update_music(position)
+                for beat in self.beats.due(position):
+                    self.spawn_jar(self.beats.lateness(beat, position))
+                    if self.game.recorder is not None:
+                        self.game.recorder.beat(beat, position)
+
+                if self.beats.finished and not self.elements.get("Jars"):
                     message = self.game.get_window("Game Over").get_element("message")
                     message.message = "You Won"
                     score = self.game.get_window("Game Over").get_element("Score")
                     score.message = self.score
                     self.close()
-                await asyncio.sleep(sleep_time)
-                try:
-                    self.timestamps.pop()
-                except IndexError:
-                    pass
-            else:
-                await asyncio.sleep(0)
+                    return
+            await asyncio.sleep(0)
+
+
+class EndlessLevel(Level):
+    """A level that plays songs one after another, until every life is lost."""
+
+    def __init__(self, game, songs: list[Path], speed=300):
+        """
+        :param game: The Game object that this level belongs to.
+        :param songs: The songs to play, in order. They start over after the last.
+        :param speed: How many pixels per second each jar should fall at.
+        """
+
+        super().__init__(game, None, speed)
+        self.songs = songs
+        self._playing = None
+
+    def load_beats(self, assets: dict) -> None:
+        """
+        Start finding the beats of the songs while they play.
+
+        :param assets: Everything that was loaded ahead of time, by name.
+        """
+
+        self.stop_stream()
+        # Spawning jars later is the same as moving every beat back by the audio delay
+        self.beats = BeatStream(
+            itertools.cycle(self.songs), self.lead_time - get_offset()
+        )
+        if self.game.clock.realtime:
+            self.beats.start()
+
+    def load_music(self, assets: dict) -> None:
+        """
+        Get ready to play the songs, which start once the first one is decoded.
+
+        :param assets: Everything that was loaded ahead of time, by name.
+        """
+
+        self._playing = None
+        pygame.mixer.music.set_volume(get_value("Song Volume"))
+
+    def update_music(self, position: float) -> None:
+        """
+        Start the next song once the last one has ended.
+
+        :param position: How far into the level playback is, in seconds.
+        """
+
+        if not isinstance(self.beats, BeatStream):
+            # Replaying a recording, which already has every beat
+            return
+
+        song = self.beats.song_at(position)
+        if song is not None and song != self._playing:
+            start, path = self._playing = song
+            pygame.mixer.music.load(path)
+            pygame.mixer.music.play(start=position - start)
+
+    def load_recorded_beats(self, session) -> None:
+        """
+        Get ready to spawn a jar on every beat a recording spawned one on.
+
+        :param session: The recording being played back.
+        """
+
+        self.stop_stream()
+        super().load_recorded_beats(session)
+
+    def stop_stream(self) -> None:
+        """Stop finding beats, if they're being found."""
+
+        if isinstance(self.beats, BeatStream):
+            self.beats.stop()
+
+    def exit(self) -> None:
+        """Stop playing, and stop finding beats."""
+
+        super().exit()
+        self.stop_stream()
+
+    def unload(self) -> None:
+        """Let go of the background, the jars, and the songs' beats."""
+
+        super().unload()
+        self._playing = None
+
+    def resources(self) -> dict[str, int | str]:
+        """How much the level is holding on to, including the thread finding beats."""
+
+        resources = super().resources()
+        resources["threads"] = int(
+            isinstance(self.beats, BeatStream) and self.beats.working
+        )
+        return resources
@@ -1,63 +1,232 @@
 """Classes and constants for creating the graphical user interface."""
 
-import time
-from time import perf_counter
-
 import pygame
 
+from .cache import TEXT, TEXTURES
 from .constants import *
+from .display import get_screen
+
+# Which layer an element is drawn in. Static elements are drawn once onto a copy of
+# the background, which is drawn instead of redrawing each of them every frame.
+STATIC = 0
+DYNAMIC = 1
 
 
 def get_sprite_height(sprite="belt.png"):
-    sprite_image = pygame.image.load(SPRITES / sprite)
-    sprite = pygame.sprite.Sprite()
-    sprite.image = sprite_image
-    sprite.rect = sprite.image.get_rect()
-    return sprite.rect.height
+    return TEXTURES.get_size(SPRITES / sprite)[1]
 
 
 def get_sprite_width(sprite="belt.png"):
-    sprite_image = pygame.image.load(SPRITES / sprite)
-    sprite = pygame.sprite.Sprite()
-    sprite.image = sprite_image
-    sprite.rect = sprite.image.get_rect()
-    return sprite.rect.width
+    return TEXTURES.get_size(SPRITES / sprite)[0]
+
+
+def merge_rects(rects: list[pygame.Rect]) -> list[pygame.Rect]:
+    """
+    Combine overlapping rectangles so no area is drawn twice.
+
+    :param rects: The rectangles to combine.
+    """
+
+    merged = []
+    for rect in rects:
+        rect = pygame.Rect(rect)
+        index = rect.collidelist(merged)
+        while index != -1:
+            rect.union_ip(merged.pop(index))
+            index = rect.collidelist(merged)
+        merged.append(rect)
+    return merged
 
 
 class Window:
     """Base class for creating all GUI windows."""
 
-    def __init__(self, background, elements):
-        """ """
+    def __init__(self, background, elements, on_update: Function = None):
+        """
+        :param background: The file path to the background image
+        :param elements: The UI elements in the window, by name
+        :param on_update: A function called each frame
+        """
         if background is None:
             background = SPRITES / "GameBackground.png"
         if elements is None:
             elements = {}
+        if on_update is not None:
+            self.on_update = on_update
 
-        self._background = pygame.transform.scale(
-            pygame.image.load(background).convert(),
-            (WIDTH, HEIGHT),
-        )
+        self.background_path = background
+        self._background = None
 
         self.running = True
-        self._last_click = None
         self.elements = elements
 
+        # Only redraw the parts of the screen that changed since the last frame
+        self.use_dirty_rects = True
+        self._redraw = True
+        self._on_screen: dict[Element, pygame.Rect] = {}
+        self._drawn_over: list[pygame.Rect] = []
+
+        # The background with every static element drawn on it, and where they were
+        self._static_layer: pygame.Surface | None = None
+        self._static_rects: dict[Element, pygame.Rect] = {}
+
     def update_elements(self, game):
         """Updates each element every frame."""
         for name, element in self.elements.items():
             element.on_update()
-            if element.is_pressed:
-                if self._last_click is None or perf_counter() - self._last_click > 0.2:
-                    element.on_click()
-                    self._last_click = time.perf_counter()
-
-    def display_elements(self):
-        """Display each element every frame."""
-        SCREEN.blit(self._background, (0, 0))
-        for element in self.elements.values():
-            element.show()
-        pygame.display.update()
+
+        for position in game.mouse.pop_clicks():
+            if not self.click(game, position, self.elements.values()):
+                break
+
+    def click(self, game, position: Coordinate, elements) -> bool:
+        """
+        Click on the first element under a position.
+
+        :param game: The Game object that this window belongs to.
+        :param position: Where the mouse was clicked.
+        :param elements: The elements that can be clicked on.
+        :returns: Whether this window is still open afterwards.
+        """
+        for element in elements:
+            if element.collides(position):
+                element.on_click()
+                break
+        return game.get_window(game.running_window) is self
+
+    def save_positions(self):
+        """Remember where every element is before the next update moves it."""
+        for element in self.drawables():
+            element.save_position()
+
+    def display_elements(self, alpha: float = 1.0) -> list[pygame.Rect] | None:
+        """
+        Draw each element every frame. Nothing is shown until the screen is presented.
+
+        :param alpha: How far between the last two updates to draw moving elements,
+            from 0 to 1.
+        :returns: The areas of the screen that changed, or None if all of it did.
+        """
+        screen = get_screen()
+        elements = self.drawables()
+        for element in elements:
+            element.interpolate(alpha)
+        static = [element for element in elements if element.layer == STATIC]
+        dynamic = [element for element in elements if element.layer != STATIC]
+
+        rebake = self.static_layer_changed(static)
+        dirty = merge_rects(self.find_dirty_rects(elements))
+
+        dirty_area = sum(rect.width * rect.height for rect in dirty)
+        if (
+            rebake
+            or self._redraw
+            or not self.use_dirty_rects
+            or dirty_area > DIRTY_AREA_LIMIT * WIDTH * HEIGHT
+        ):
+            if rebake:
+                screen.blit(self.background, (0, 0))
+                for element in static:
+                    element.show()
+                self._static_layer = screen.copy()
+                self._static_rects = {element: element.draw_rect for element in static}
+            else:
+                screen.blit(self._static_layer, (0, 0))
+            for element in dynamic:
+                element.show()
+            self._redraw = False
+            return None
+
+        for rect in dirty:
+            screen.set_clip(rect)
+            screen.blit(self._static_layer, rect, rect)
+            for element in dynamic:
+                if element.draw_rect.colliderect(rect):
+                    element.show()
+        screen.set_clip(None)
+        return dirty
+
+    def static_layer_changed(self, static: list["Element"]) -> bool:
+        """
+        Whether the static layer needs to be drawn again, because one of its elements
+        changed, moved, was added, or was removed.
+
+        :param static: Every static element that will be displayed this frame.
+        """
+        if self._static_layer is None or len(static) != len(self._static_rects):
+            return True
+        return any(
+            element.dirty or self._static_rects.get(element) != element.draw_rect
+            for element in static
+        )
+
+    @property
+    def background(self) -> pygame.Surface:
+        """The background image, scaled to the screen. Loaded the first time it's drawn."""
+        if self._background is None:
+            self.set_background(pygame.image.load(self.background_path))
+        return self._background
+
+    def set_background(self, image: pygame.Surface):
+        """
+        Use an image that was already decoded as the background.
+
+        :param image: The background image, at any size.
+        """
+        self._background = pygame.transform.scale(image.convert(), (WIDTH, HEIGHT))
+        self._static_layer = None
+
+    def surfaces(self) -> list[pygame.Surface]:
+        """The surfaces the window holds on to itself, rather than in a shared cache."""
+        return [
+            surface
+            for surface in (self._background, self._static_layer)
+            if surface is not None
+        ]
+
+    def drawables(self) -> list["Element"]:
+        """Every element to display, from back to front."""
+        return list(self.elements.values())
+
+    def find_dirty_rects(self, elements: list["Element"]) -> list[pygame.Rect]:
+        """
+        Gives the areas of the screen that changed since the last frame.
+
+        :param elements: Every element that will be displayed this frame.
+        """
+
+        dirty = []
+        on_screen = {}
+        for element in elements:
+            rect = element.draw_rect
+            old_rect = self._on_screen.pop(element, None)
+            if element.dirty or rect != old_rect:
+                dirty.append(rect)
+                if old_rect is not None:
+                    dirty.append(old_rect)
+            element.dirty = False
+            on_screen[element] = rect
+            dirty.extend(element.pop_dirty_rects())
+
+        # Anything left over was removed, so the background needs to be drawn over it
+        dirty.extend(self._on_screen.values())
+        self._on_screen = on_screen
+
+        dirty.extend(self._drawn_over)
+        self._drawn_over = []
+        return dirty
+
+    def draw_over(self, rect: pygame.Rect):
+        """
+        Redraw an area on the next frame, after something outside the window drew on it.
+
+        :param rect: The area that was drawn over.
+        """
+        self._drawn_over.append(rect)
+
+    def invalidate(self):
+        """Redraw the whole window on the next frame."""
+        self._redraw = True
 
     def get_element(self, name: str) -> "Element":
         """
@@ -71,41 +240,127 @@ class Window:
         """Can be redefined, called each frame."""
 
 
+class LoadingScreen(Window):
+    """Shows how much has loaded while waiting to open another window."""
+
+    def __init__(self, game, background=None):
+        """
+        :param game: The Game object that this window belongs to.
+        :param background: The file path to the background image.
+        """
+        super().__init__(
+            background,
+            {
+                "Progress": Text(
+                    "Loading...",
+                    (WIDTH // 2 - 200, HEIGHT // 2 - 50, 400, 100),
+                    font_size=50,
+                ),
+            },
+        )
+        self.game = game
+        self._futures = []
+        self._next_window = None
+
+    def wait_for(self, futures: list, window_name: str):
+        """
+        Wait for some assets to load, then open a window.
+
+        :param futures: The futures of the assets to wait for.
+        :param window_name: The window to open once everything has loaded.
+        """
+        self._futures = futures
+        self._next_window = window_name
+
+    def on_update(self):
+        done = sum(future.done() for future in self._futures)
+        self.get_element("Progress").message = (
+            f"Loading... {100 * done // max(len(self._futures), 1)}%"
+        )
+        if done == len(self._futures) and self._next_window is not None:
+            window_name, self._next_window = self._next_window, None
+            self.game.open(window_name)
+
+
 class Element:
     """The base UI object from which all others are made from."""
 
     def __init__(
-        self, position: Rect, border_radius=50, on_update: Function = None
+        self,
+        position: Rect,
+        border_radius=50,
+        on_update: Function = None,
+        layer=DYNAMIC,
     ):
         """
         :param position: The and y of the top left and the width and height
         :param border_radius: How rounded the edges of the element are
         :param on_update: A function called each frame
+        :param layer: STATIC if the element rarely changes, otherwise DYNAMIC
         """
 
         if on_update is not None:
             self.on_update = on_update
         self.position = position
         self._rect = pygame.Rect(position)
+        # The exact position, since the rect can only hold whole pixels
+        self._position = pygame.Vector2(self._rect.topleft)
+        self._previous_position = pygame.Vector2(self._position)
+        self._shown_rect = self._rect
         self._border_radius = border_radius
+        self.layer = layer
         self.broken = None
+        # Whether the element looks different from the last time it was drawn
+        self.dirty = True
 
     def show(self):
         """Display an element to the screen"""
         pygame.draw.rect(
-            SCREEN, (0, 0, 0), self._rect, border_radius=self._border_radius
+            get_screen(), (0, 0, 0), self._shown_rect, border_radius=self._border_radius
         )
 
     def move(self, x: int, y: int):
         """Move the element by the specified amount."""
-        self._rect.move_ip(x, y)
+        self._position += (x, y)
+        self._rect.topleft = round(self._position.x), round(self._position.y)
+
+    def save_position(self):
+        """Remember the current position to draw from until the next update."""
+        self._previous_position.update(self._position)
+
+    def interpolate(self, alpha: float):
+        """
+        Place the element between its last two positions for drawing.
+
+        :param alpha: How far from the previous position to the current one, from 0 to 1.
+        """
+        if self._previous_position == self._position:
+            self._shown_rect = self._rect
+            return
+        x, y = self._previous_position.lerp(self._position, alpha)
+        self._shown_rect = self._rect.copy()
+        self._shown_rect.topleft = round(x), round(y)
 
     @property
-    def is_pressed(self):
-        """Determine whether the mouse is pressing an element."""
-        return pygame.mouse.get_pressed()[0] and self._rect.collidepoint(
-            pygame.mouse.get_pos()
-        )
+    def draw_rect(self) -> pygame.Rect:
+        """The area of the screen the element covers when shown."""
+        return self._shown_rect
+
+    def pop_dirty_rects(self) -> list[pygame.Rect]:
+        """
+        Gives any areas inside the element that changed since it was last drawn.
+
+        Only needed by elements that draw several things that change independently.
+        """
+        return []
+
+    def collides(self, position: Coordinate) -> bool:
+        """
+        Determine whether a point is on the element.
+
+        :param position: The x and y of the point.
+        """
+        return self._rect.collidepoint(position)
 
     def on_click(self):
         """Called when an element is clicked on"""
@@ -140,24 +395,54 @@ class Text(Element):
         """
 
         super().__init__(position, border_radius, on_update)
+        self._message = None
+        self._surface = None
         self.message = message
         self.color = color
         self._border_radius = border_radius
         self._font_size = font_size
 
-    def show(self):
+    @property
+    def message(self):
+        """The words that the element shows."""
+        return self._message
+
+    @message.setter
+    def message(self, message):
+        if message != self._message:
+            self._message = message
+            self._surface = None
+            self.dirty = True
+
+    @property
+    def color(self):
+        """The RGB value of the text."""
+        return self._color
+
+    @color.setter
+    def color(self, color: RGB):
+        self._color = color
+        self._surface = None
+        self.dirty = True
+
+    def render(self) -> pygame.Surface:
+        """Draw the background and text onto a surface the size of the element."""
+
+        surface = pygame.Surface(self._rect.size, pygame.SRCALPHA)
         pygame.draw.rect(
-            SCREEN, (183, 101, 59), self._rect, border_radius=self._border_radius
+            surface,
+            (183, 101, 59),
+            surface.get_rect(),
+            border_radius=self._border_radius,
         )
-        font = pygame.font.get_default_font()
-        text = pygame.font.Font(font, self._font_size).render(
-            str(self.message).encode(encoding="UTF-8", errors="ignore"),
-            True,
-            self.color,
-        )
-        text_rect = text.get_rect()
-        text_rect.center = self.center
-        SCREEN.blit(text, text_rect)
+        text = TEXT.render(str(self.message), self._font_size, self.color)
+        surface.blit(text, text.get_rect(center=surface.get_rect().center))
+        return surface
+
+    def show(self):
+        if self._surface is None:
+            self._surface = self.render()
+        get_screen().blit(self._surface, self._shown_rect)
 
 
 class TextButton(Text):
@@ -203,6 +488,7 @@ class Button(Element):
         scale=2.5,
         on_update: Function = None,
         on_click: Function = None,
+        layer=DYNAMIC,
     ):
         """
         :param path: The file path to the image of the button
@@ -211,45 +497,60 @@ class Button(Element):
         :param angle: The counterclockwise rotation of the image, in degrees
         :param on_update: A function called each frame
         :param on_click: A function called each time the button is pressed
+        :param layer: STATIC if the button rarely changes, otherwise DYNAMIC
         """
+        self._image = None
+        self._image_key = None
         self.path = path
         self.angle = angle
         self.scale = scale
-        sp = pygame.image.load(path)
-        original_width, original_height = sp.get_size()
+        original_width, original_height = TEXTURES.get_size(path)
         self._width = int(original_width * self.scale)
         self._height = int(original_height * self.scale)
         super().__init__(
-            self.sprite.get_rect().move(top_left), border_radius, on_update
+            self.sprite.get_rect().move(top_left), border_radius, on_update, layer
         )
         if on_click is not None:
             self.on_click = on_click
 
+    @property
+    def path(self) -> Path:
+        """The file path to the image of the button."""
+        return self._path
+
+    @path.setter
+    def path(self, path: Path):
+        self._path = path
+        self.dirty = True
+
     def get_button_height(self):
-        sprite_image = pygame.image.load(SPRITES / self.path)
-        sprite = pygame.sprite.Sprite()
-        sprite.image = sprite_image
-        sprite.rect = sprite.image.get_rect()
-        return sprite.rect.height
+        return TEXTURES.get_size(SPRITES / self.path)[1]
 
     def get_button_width(self):
-        sprite_image = pygame.image.load(SPRITES / self.path)
-        sprite = pygame.sprite.Sprite()
-        sprite.image = sprite_image
-        sprite.rect = sprite.image.get_rect()
-        return sprite.rect.width
+        return TEXTURES.get_size(SPRITES / self.path)[0]
+
+    @property
+    def image(self) -> pygame.Surface:
+        """The scaled and rotated image, kept until the path or angle changes."""
+        key = (self.path, self.angle)
+        if key != self._image_key:
+            self._image = TEXTURES.get(self.path, (self._width, self._height), self.angle)
+            self._image_key = key
+        return self._image
 
     def show(self):
-        image = pygame.transform.rotate(self.sprite, self.angle)
-        rect = image.get_rect(center=self.center)
+        image = self.image
+        rect = image.get_rect(center=self._shown_rect.center)
 
-        SCREEN.blit(image, rect)
+        get_screen().blit(image, rect)
+
+    @property
+    def draw_rect(self) -> pygame.Rect:
+        return self.image.get_rect(center=self._shown_rect.center)
 
     def on_click(self):
         """Called whenever the button is pressed"""
 
     @property
     def sprite(self):
-        return pygame.transform.scale(
-            pygame.image.load(self.path), (self._width, self._height)
-        )
+        return TEXTURES.get(self.path, (self._width, self._height))
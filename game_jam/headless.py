@@ -0,0 +1,212 @@
+"""
+Runs the game without a window or sound card, timing every frame.
+
+Frames run one after another on a virtual clock, so a run plays out the same
+way on any machine. For example, to play through all of Level Two:
+    py -m game_jam.headless --window "Level Two" --autoplay
+
+This has to be imported before anything else from the game, since the video and
+audio drivers are chosen when pygame first starts.
+"""
+
+import os
+
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+from pathlib import Path
+from time import perf_counter
+
+import numpy as np
+import pygame
+
+from . import display
+from .clock import VirtualClock
+from .constants import HEIGHT, HIT_LINE, Coordinate
+from .jars import PICKLE
+from .lifecycle import print_report
+from .profiler import PROFILER
+
+# Draw straight to a window the size of the screen, so nothing is scaled
+display.window_size = display.LOGICAL_SIZE
+
+# Seconds spent updating and drawing a single frame
+FrameTime = tuple[float, float]
+# Events to post before each frame, by frame number
+Script = dict[int, list[pygame.event.Event]]
+
+
+def click(position: Coordinate) -> pygame.event.Event:
+    """
+    A left click, to be used in a script.
+
+    :param position: Where the click happens.
+    """
+
+    return pygame.event.Event(
+        pygame.MOUSEBUTTONDOWN, pos=position, button=pygame.BUTTON_LEFT
+    )
+
+
+def autoplay(level) -> list[pygame.event.Event]:
+    """
+    Clicks on every whole jar, other than pickles, that has reached the hit line.
+
+    :param level: The Level being played.
+    """
+
+    jars = level.elements.get("Jars")
+    n = len(jars)
+    sizes = jars.sizes[jars.color[:n]]
+    bottoms = jars.top[:n] + sizes[:, 1]
+    ready = np.flatnonzero(
+        (jars.broken[:n] == 0)
+        & (jars.color[:n] != PICKLE)
+        & (bottoms >= HIT_LINE * HEIGHT)
+    )
+    centers_x = jars.left[:n] + sizes[:, 0] // 2
+    centers_y = jars.top[:n] + sizes[:, 1] // 2
+    return [click((int(centers_x[i]), int(centers_y[i]))) for i in ready.tolist()]
+
+
+async def simulate(
+    game,
+    window_name: str,
+    frames: int = None,
+    script: Script = None,
+    play: bool = False,
+    seed: int = 0,
+) -> list[FrameTime]:
+    """
+    Run the game headlessly and time each frame.
+
+    :param game: The Game object to run.
+    :param window_name: The window to open first.
+    :param frames: How many frames to run, or None to run until the window closes.
+    :param script: Events to post before each frame, by frame number.
+    :param play: Whether to click on jars automatically when a level is open.
+    :param seed: The seed for choosing jar colors and belts.
+    :returns: How long updating and drawing took for each frame.
+    """
+
+    random.seed(seed)
+    game.clock = VirtualClock()
+    game.start()
+
+    # Finish loading before the clock starts, so every run begins the same way
+    window = game.get_window(window_name)
+    if hasattr(window, "prefetch"):
+        for future in window.prefetch():
+            future.result()
+    game.open(window_name)
+    # Like in the game, anything the window started runs before the next frame
+    await asyncio.sleep(0)
+
+    times = []
+    frame = 0
+    while frames is None or frame < frames:
+        for event in (script or {}).get(frame, []):
+            pygame.event.post(event)
+        if play and game.running_window == window_name and hasattr(window, "elements"):
+            if window.running and "Jars" in window.elements:
+                for event in autoplay(window):
+                    pygame.event.post(event)
+
+        started = perf_counter()
+        game.update()
+        updated = perf_counter()
+        game.draw()
+        times.append((updated - started, perf_counter() - updated))
+
+        await asyncio.sleep(0)
+        frame += 1
+        if frames is None and game.running_window != window_name:
+            break
+
+    return times
+
+
+def summarize(times: list[FrameTime]) -> dict[str, float]:
+    """
+    Gives the average, median, 99th percentile, and worst frame times, in milliseconds.
+
+    :param times: How long updating and drawing took for each frame.
+    """
+
+    summary = {"frames": len(times)}
+    if not times:
+        return summary
+
+    phases = {
+        "update": [update for update, _ in times],
+        "render": [render for _, render in times],
+        "frame": [update + render for update, render in times],
+    }
+    for phase, values in phases.items():
+        ordered = sorted(1000 * value for value in values)
+        summary[f"{phase}_mean_ms"] = statistics.fmean(ordered)
+        summary[f"{phase}_p50_ms"] = ordered[len(ordered) // 2]
+        summary[f"{phase}_p99_ms"] = ordered[99 * (len(ordered) - 1) // 100]
+        summary[f"{phase}_max_ms"] = ordered[-1]
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the game headlessly and time it.")
+    parser.add_argument("--window", default="Menu", help="the window to open")
+    parser.add_argument(
+        "--frames", type=int, help="how many frames to run (default: until it closes)"
+    )
+    parser.add_argument("--autoplay", action="store_true", help="click on jars")
+    parser.add_argument("--seed", type=int, default=0, help="the random seed")
+    parser.add_argument("--output", help="also save every frame's times to this file")
+    parser.add_argument(
+        "--record", type=Path, help="save a recording of each level played here"
+    )
+    parser.add_argument(
+        "--resources",
+        action="store_true",
+        help="print what each level is holding on to afterwards, and any leaks",
+    )
+    parser.add_argument(
+        "--trace", help="save a trace of each frame's phases to this .json or .csv file"
+    )
+    args = parser.parse_args()
+
+    from main import my_game
+
+    my_game.record_to = args.record
+    if args.trace:
+        PROFILER.start_recording()
+    async def run():
+        times = await simulate(
+            my_game, args.window, args.frames, play=args.autoplay, seed=args.seed
+        )
+        if args.resources:
+            # Before the event loop closes, while any leaked tasks are still running
+            print_report(my_game)
+        return times
+
+    times = asyncio.run(run())
+    if args.trace:
+        PROFILER.stop_recording(args.trace)
+    if my_game.recorder is not None:
+        my_game.recorder.close()
+    summary = summarize(times)
+    window = my_game.get_window(args.window)
+    if hasattr(window, "score"):
+        summary["score"] = window.score
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"summary": summary, "frames": times}, file)
+
+
+if __name__ == "__main__":
+    main()
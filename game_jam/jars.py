@@ -0,0 +1,371 @@
+"""The falling jars of a level, stored as arrays so they can be updated all at once."""
+
+import numpy as np
+import pygame
+
+from .animation import register_animation
+from .cache import TEXTURES
+from .constants import (
+    FRAMES_PER_ANIMATION,
+    HEIGHT,
+    SPRITES,
+    TIMESTEP,
+    WIDTH,
+    Coordinate,
+)
+from .display import get_screen
+from .gui import Element
+
+COLORS = ("pickle", "red", "purple", "magenta")
+PICKLE = COLORS.index("pickle")
+SMASH_FRAMES = 3
+# Room for a few more jars than the busiest part of the song needs
+SPARE_JARS = 8
+
+
+def peak_jars(timestamps: list[float], lifetime: float) -> int:
+    """
+    The most jars that will ever be on screen at once during a song.
+
+    :param timestamps: The time each jar spawns, in seconds.
+    :param lifetime: How many seconds a jar stays on screen.
+    """
+
+    if not len(timestamps):
+        return 0
+
+    times = np.sort(np.asarray(timestamps, dtype=np.float64))
+    # For each jar, count the jars that spawn before it disappears
+    ends = np.searchsorted(times, times + lifetime, side="left")
+    return int((ends - np.arange(len(times))).max())
+
+
+class JarField(Element):
+    """
+    Every jar falling in a level.
+
+    Each jar is a row in a set of parallel arrays instead of its own object, so
+    moving, breaking, and removing jars happens for all of them at once. Jars are
+    referred to by their index, which can change whenever broken jars are removed.
+
+    Live jars are kept packed at the start of the arrays and everything after them
+    is free. A removed jar's slot is filled by moving the last jar into it, so the
+    arrays are only reallocated if a level needs more room than it reserved.
+    """
+
+    ARRAYS = (
+        "left",
+        "top",
+        "previous_top",
+        "shown_top",
+        "lane",
+        "color",
+        "broken",
+        "drawn",
+        "was_drawn",
+    )
+
+    def __init__(self, lanes: list[int], scale=2.5, capacity=SPARE_JARS):
+        """
+        :param lanes: The x coordinate of the left side of each belt.
+        :param scale: How much bigger to draw each jar than its image.
+        :param capacity: How many jars there is room for before the arrays grow.
+        """
+
+        super().__init__((0, 0, WIDTH, HEIGHT), border_radius=0)
+        self.lanes = np.array(lanes, dtype=np.int32)
+        self.scale = scale
+        self.count = 0
+
+        self.left = np.zeros(capacity, dtype=np.int32)
+        self.top = np.zeros(capacity, dtype=np.float64)
+        self.previous_top = np.zeros(capacity, dtype=np.float64)
+        self.shown_top = np.zeros(capacity, dtype=np.int32)
+        self.lane = np.zeros(capacity, dtype=np.int8)
+        self.color = np.zeros(capacity, dtype=np.int8)
+        # 0 while a jar is whole, otherwise one more than how many updates it has been
+        # breaking for
+        self.broken = np.zeros(capacity, dtype=np.int16)
+        # Where each jar was last drawn, as left, top, right, bottom
+        self.drawn = np.zeros((capacity, 4), dtype=np.int32)
+        self.was_drawn = np.zeros(capacity, dtype=bool)
+
+        sizes = []
+        for color in COLORS:
+            width, height = TEXTURES.get_size(SPRITES / f"{color}Jar.png")
+            sizes.append((int(width * scale), int(height * scale)))
+        self.sizes = np.array(sizes, dtype=np.int32)
+        self._whole = [
+            TEXTURES.get(SPRITES / f"{color}Jar.png", size)
+            for color, size in zip(COLORS, sizes)
+        ]
+        self._smashes = [
+            register_animation(
+                f"{color}JarSmash",
+                [SPRITES / f"{color}JarSmash{i}.png" for i in range(1, SMASH_FRAMES + 1)],
+                FRAMES_PER_ANIMATION,
+                size,
+            )
+            for color, size in zip(COLORS, sizes)
+        ]
+        self._smash_lengths = np.array([len(smash) for smash in self._smashes])
+        self._widest = int(self.sizes[:, 0].max())
+        self._tallest = int(self.sizes[:, 1].max())
+        # The jars on each belt sorted from top to bottom, rebuilt when jars are added
+        # or removed
+        self._index = None
+        self._removed: list[pygame.Rect] = []
+        self.dirty = False
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def capacity(self) -> int:
+        """How many jars fit in the arrays."""
+        return len(self.top)
+
+    def spawn(self, lane: int, color: int, top: float = 0) -> int:
+        """
+        Add a new jar to the top of a belt.
+
+        :param lane: Which belt the jar falls down.
+        :param color: The index of the jar's color in `COLORS`.
+        :param top: How far down the screen the jar starts.
+        :returns: The index of the new jar.
+        """
+
+        if self.count == self.capacity:
+            self._resize(self.capacity * 2)
+
+        index = self.count
+        self.left[index] = self.lanes[lane]
+        self.top[index] = self.previous_top[index] = top
+        self.lane[index] = lane
+        self.color[index] = color
+        self.broken[index] = 0
+        self.was_drawn[index] = False
+        self.count += 1
+        self._index = None
+        return index
+
+    def reserve(self, capacity: int) -> None:
+        """
+        Make sure there is room for a number of jars at once.
+
+        :param capacity: How many jars need to fit.
+        """
+
+        if capacity > self.capacity:
+            self._resize(capacity)
+
+    def lifetime(self, speed: float) -> float:
+        """
+        How many seconds a jar lasts, from spawning to being broken on the floor.
+
+        :param speed: How many pixels per second the jar falls.
+        """
+
+        falling = (HEIGHT + self._tallest) / speed
+        breaking = (int(self._smash_lengths.max()) + 1) * TIMESTEP
+        return falling + breaking
+
+    def clear(self) -> None:
+        """Remove every jar."""
+
+        for index in np.flatnonzero(self.was_drawn[: self.count]):
+            self._removed.append(pygame.Rect(self._drawn_rect(index)))
+        self.count = 0
+        self._index = None
+
+    def fall(self, distance: float) -> np.ndarray:
+        """
+        Move every jar down.
+
+        :param distance: How many pixels to move each jar.
+        :returns: The indices of the whole jars that fell off the bottom of the screen.
+        """
+
+        n = self.count
+        # Every jar moves the same amount, so the lane index stays in order
+        self.top[:n] += distance
+        centers = self.top[:n] + self.sizes[self.color[:n], 1] / 2
+        return np.flatnonzero((self.broken[:n] == 0) & (centers > HEIGHT))
+
+    def smash(self, index: int) -> None:
+        """
+        Start breaking a jar.
+
+        :param index: The jar to break.
+        """
+
+        self.broken[index] = 1
+
+    def animate(self) -> None:
+        """Move each breaking jar onto its next frame and remove the ones that finished."""
+
+        n = self.count
+        broken = self.broken[:n]
+        finished = broken > self._smash_lengths[self.color[:n]]
+        broken[(broken > 0) & ~finished] += 1
+        if finished.any():
+            self._remove(finished)
+
+    def is_pickle(self, index: int) -> bool:
+        """Whether a jar is a pickle jar."""
+        return self.color[index] == PICKLE
+
+    def lane_at(self, x: int) -> int | None:
+        """
+        Gives the belt under an x coordinate.
+
+        :param x: The x coordinate.
+        :returns: The index of the belt, or None if it's between belts.
+        """
+
+        lane = int(np.searchsorted(self.lanes, x, side="right")) - 1
+        if lane < 0 or x >= self.lanes[lane] + self._widest:
+            return None
+        return lane
+
+    def at(self, position: Coordinate) -> np.ndarray:
+        """
+        Gives the whole jars that cover a point.
+
+        Only the jars on the belt under the point are looked at, and they are
+        searched by height, so this stays fast however many jars there are.
+
+        :param position: The x and y of the point.
+        """
+
+        x, y = position
+        lane = self.lane_at(x)
+        if lane is None:
+            return np.empty(0, dtype=np.intp)
+
+        order, starts = self._lane_index()
+        jars = order[starts[lane] : starts[lane + 1]]
+        tops = self.top[jars]
+        jars = jars[
+            np.searchsorted(tops, y - self._tallest, side="right") : np.searchsorted(
+                tops, y, side="right"
+            )
+        ]
+
+        sizes = self.sizes[self.color[jars]]
+        hit = (
+            (self.broken[jars] == 0)
+            & (x < self.left[jars] + sizes[:, 0])
+            & (y < self.top[jars] + sizes[:, 1])
+        )
+        return jars[hit]
+
+    def collides(self, position: Coordinate) -> bool:
+        return len(self.at(position)) > 0
+
+    def save_position(self):
+        self.previous_top[: self.count] = self.top[: self.count]
+
+    def interpolate(self, alpha: float):
+        n = self.count
+        previous = self.previous_top[:n]
+        self.shown_top[:n] = np.rint(previous + (self.top[:n] - previous) * alpha)
+
+    def pop_dirty_rects(self) -> list[pygame.Rect]:
+        n = self.count
+        sizes = self.sizes[self.color[:n]]
+        rects = np.empty((n, 4), dtype=np.int32)
+        rects[:, 0] = self.left[:n]
+        rects[:, 1] = self.shown_top[:n]
+        rects[:, 2] = rects[:, 0] + sizes[:, 0]
+        rects[:, 3] = rects[:, 1] + sizes[:, 1]
+
+        # Breaking jars change image without moving, so they are always redrawn
+        changed = ~self.was_drawn[:n] | (self.broken[:n] > 0)
+        changed |= (rects != self.drawn[:n]).any(axis=1)
+
+        # Cover both where the jar was and where it is now
+        drawn = self.drawn[:n]
+        old = self.was_drawn[:n]
+        covered = rects.copy()
+        covered[old, :2] = np.minimum(rects[old, :2], drawn[old, :2])
+        covered[old, 2:] = np.maximum(rects[old, 2:], drawn[old, 2:])
+
+        self.drawn[:n] = rects
+        self.was_drawn[:n] = True
+
+        dirty = self._removed
+        self._removed = []
+        for left, top, right, bottom in covered[changed].tolist():
+            dirty.append(pygame.Rect(left, top, right - left, bottom - top))
+        return dirty
+
+    def show(self):
+        n = self.count
+        if not n:
+            return
+
+        # Only draw the jars inside the part of the screen being redrawn
+        screen = get_screen()
+        clip = screen.get_clip()
+        left = self.left[:n]
+        top = self.shown_top[:n]
+        sizes = self.sizes[self.color[:n]]
+        visible = np.flatnonzero(
+            (left < clip.right)
+            & (left + sizes[:, 0] > clip.left)
+            & (top < clip.bottom)
+            & (top + sizes[:, 1] > clip.top)
+        )
+
+        screen.blits(
+            [
+                (
+                    self._smashes[color].image(broken - 1)
+                    if broken
+                    else self._whole[color],
+                    (x, y),
+                )
+                for x, y, color, broken in zip(
+                    left[visible].tolist(),
+                    top[visible].tolist(),
+                    self.color[:n][visible].tolist(),
+                    self.broken[:n][visible].tolist(),
+                )
+            ],
+            doreturn=False,
+        )
+
+    def _drawn_rect(self, index: int) -> tuple[int, int, int, int]:
+        left, top, right, bottom = self.drawn[index].tolist()
+        return left, top, right - left, bottom - top
+
+    def _lane_index(self) -> tuple[np.ndarray, np.ndarray]:
+        if self._index is None:
+            n = self.count
+            order = np.lexsort((self.top[:n], self.lane[:n]))
+            starts = np.searchsorted(self.lane[:n][order], np.arange(len(self.lanes) + 1))
+            self._index = order, starts
+        return self._index
+
+    def _remove(self, removed: np.ndarray) -> None:
+        self._index = None
+        # Fill each gap with the last jar, starting from the end so the last jar is
+        # never one that is being removed
+        for index in np.flatnonzero(removed)[::-1].tolist():
+            if self.was_drawn[index]:
+                self._removed.append(pygame.Rect(self._drawn_rect(index)))
+
+            last = self.count - 1
+            if index != last:
+                for name in self.ARRAYS:
+                    array = getattr(self, name)
+                    array[index] = array[last]
+            self.count -= 1
+
+    def _resize(self, capacity: int) -> None:
+        for name in self.ARRAYS:
+            array = getattr(self, name)
+            resized = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+            resized[: self.count] = array[: self.count]
+            setattr(self, name, resized)
@@ -0,0 +1,226 @@
+"""
+The stages a level goes through, the tasks it runs along the way, and checks that
+nothing a level started outlives it.
+
+A level is loaded once its assets are ready, entered each time it's played, can be
+paused and resumed, is exited when play stops, and can be unloaded to let go of what
+it drew with. Levels are unloaded as soon as they're left, and checked for anything
+they held on to. Press F5 while playing to print how much each level is holding on to,
+and anything that leaked.
+"""
+
+import asyncio
+import traceback
+from typing import Coroutine
+
+import pygame
+
+from .cache import TEXT, TEXTURES
+from .loader import LOADER
+
+# The stages of a level, in the order they usually happen
+UNLOADED = "unloaded"
+LOADED = "loaded"
+ENTERED = "entered"
+PAUSED = "paused"
+EXITED = "exited"
+# The stages where a level is being played, so it's allowed to have tasks running
+ACTIVE = (ENTERED, PAUSED)
+
+REPORT_KEY = pygame.K_F5
+
+# What levels still held on to right after they were unloaded, for the next report
+_unload_leaks: list[str] = []
+
+
+class TaskSupervisor:
+    """
+    Keeps track of the tasks something started, so they can all be cancelled at once.
+
+    A task that fails prints its error instead of it going unnoticed.
+    """
+
+    def __init__(self, name: str):
+        """
+        :param name: What the tasks belong to, to name them after.
+        """
+
+        self.name = name
+        self.failures = 0
+        self._tasks: set[asyncio.Task] = set()
+
+    def start(self, coroutine: Coroutine, name: str) -> asyncio.Task:
+        """
+        Run a coroutine as a task.
+
+        :param coroutine: The coroutine to run.
+        :param name: What the task does.
+        """
+
+        task = asyncio.create_task(coroutine, name=f"{self.name}: {name}")
+        self._tasks.add(task)
+        task.add_done_callback(self._finished)
+        return task
+
+    def cancel(self) -> None:
+        """Cancel every task that's still running."""
+
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+
+    def owns(self, task: asyncio.Task) -> bool:
+        """
+        Whether a task was started here and hasn't finished.
+
+        :param task: The task to check.
+        """
+
+        return task in self._tasks
+
+    def __len__(self):
+        return len(self._tasks)
+
+    def _finished(self, task: asyncio.Task) -> None:
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.failures += 1
+            traceback.print_exception(task.exception())
+
+
+def live_tasks() -> set[asyncio.Task]:
+    """Every task that hasn't finished, other than the one asking."""
+
+    try:
+        tasks = asyncio.all_tasks()
+    except RuntimeError:
+        # There's no event loop running
+        return set()
+    return tasks - {asyncio.current_task()}
+
+
+def opened_levels(game) -> dict:
+    """
+    Every level that's been opened, by name.
+
+    :param game: The Game object the levels belong to.
+    """
+
+    # Imported here, since gameplay uses this module
+    from .gameplay import Level
+
+    return {
+        name: window
+        for name, window in game.windows.items()
+        if isinstance(window, Level)
+    }
+
+
+def resource_counts(game) -> dict[str, dict]:
+    """
+    How much each level that's been opened is holding on to, and in total.
+
+    :param game: The Game object the levels belong to.
+    """
+
+    counts = {name: level.resources() for name, level in opened_levels(game).items()}
+    counts["Total"] = {
+        "tasks": len(live_tasks()),
+        # Held by the levels themselves, and by the shared caches
+        "surfaces": sum(level["surfaces"] for level in counts.values())
+        + len(TEXTURES)
+        + len(TEXT),
+        "textures": len(TEXTURES),
+        "texture_mb": round(TEXTURES.memory_used / 2**20, 1),
+        "rendered_text": len(TEXT),
+        "loader_assets": len(LOADER),
+    }
+    return counts
+
+
+def level_leaks(name: str, level) -> list[str]:
+    """
+    Describes everything one level started or loaded that it should have let go of.
+
+    :param name: The name of the level.
+    :param level: The level to check.
+    """
+
+    leaks = []
+    counts = level.resources()
+    if level.stage not in ACTIVE:
+        for resource in ("tasks", "threads"):
+            if counts.get(resource):
+                leaks.append(
+                    f"{name} has {counts[resource]} {resource} left running "
+                    f"after it was {level.stage}"
+                )
+    if level.stage == UNLOADED:
+        for resource in ("surfaces", "jars", "beats_left"):
+            if counts[resource]:
+                leaks.append(
+                    f"{name} still has {counts[resource]} {resource} "
+                    f"after it was unloaded"
+                )
+    return leaks
+
+
+def check_unloaded(name: str, level) -> None:
+    """
+    Remember anything a level still holds right after it was unloaded, including what
+    it loaded ahead of time, so the next report shows it.
+
+    :param name: The name of the level.
+    :param level: The level that was just unloaded.
+    """
+
+    _unload_leaks.extend(level_leaks(name, level))
+    counts = level.resources()
+    for resource in ("assets", "cached_assets"):
+        if counts[resource]:
+            _unload_leaks.append(
+                f"{name} still had {counts[resource]} {resource} after it was unloaded"
+            )
+
+
+def find_leaks(game) -> list[str]:
+    """
+    Describes everything a level started or loaded that it should have let go of.
+
+    :param game: The Game object the levels belong to.
+    """
+
+    leaks = list(_unload_leaks)
+    levels = opened_levels(game)
+    for name, level in levels.items():
+        leaks.extend(level_leaks(name, level))
+
+    for task in live_tasks():
+        if not any(level.tasks.owns(task) for level in levels.values()):
+            leaks.append(f"Nothing is supervising the task {task.get_name()!r}")
+    return leaks
+
+
+def print_report(game) -> None:
+    """
+    Print how much each level is holding on to, and anything that leaked.
+
+    :param game: The Game object the levels belong to.
+    """
+
+    for name, counts in resource_counts(game).items():
+        print(f"{name}: {', '.join(f'{key} {value}' for key, value in counts.items())}")
+    for leak in find_leaks(game):
+        print(f"Leak: {leak}")
+
+
+def handle(event: pygame.event.Event, game) -> None:
+    """
+    Print the resource report when its key is pressed.
+
+    :param event: An event from the pygame event queue.
+    :param game: The Game object the levels belong to.
+    """
+
+    if event.type == pygame.KEYDOWN and event.key == REPORT_KEY:
+        print_report(game)
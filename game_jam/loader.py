@@ -0,0 +1,130 @@
+"""Loads images, sounds, songs, and beatmaps in the background so the game never freezes."""
+
+import asyncio
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import pygame
+
+from . import audio_processing
+
+
+class AssetManager:
+    """
+    Starts loading assets ahead of time and hands back futures for them.
+
+    Each asset is only loaded once, so asking for it again gives the same future.
+    The browser build has no threads, so there each asset is loaded in its own
+    turn of the event loop instead.
+    """
+
+    def __init__(self, workers: int = 2):
+        """
+        :param workers: How many assets can load at the same time.
+        """
+
+        self._executor = None
+        if sys.platform != "emscripten":
+            self._executor = ThreadPoolExecutor(workers, thread_name_prefix="assets")
+        self._futures: dict[tuple[str, str], Future] = {}
+
+    def image(self, path: Path) -> Future:
+        """
+        Decode an image. It still needs to be converted once it's ready.
+
+        :param path: The file path to the image.
+        """
+
+        return self._load("image", path, pygame.image.load)
+
+    def beats(self, path: Path) -> Future:
+        """
+        Find the time of every beat in a song.
+
+        :param path: The file path to the song.
+        """
+
+        return self._load("beats", path, audio_processing.get_each_note)
+
+    def sound(self, path: Path) -> Future:
+        """
+        Decode a sound effect, so playing it for the first time doesn't have to.
+
+        :param path: The file path to the sound.
+        """
+
+        # The mixer has to be set up before anything can be decoded for it
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        return self._load("sound", path, pygame.mixer.Sound)
+
+    def data(self, path: Path) -> Future:
+        """
+        Read a whole file into memory, like a song to stream from.
+
+        :param path: The file path to read.
+        """
+
+        return self._load("data", path, Path.read_bytes)
+
+    def forget(self, path: Path) -> None:
+        """
+        Let go of everything loaded from a file, so it will be loaded again next time.
+
+        :param path: The file path of the asset.
+        """
+
+        for key in [key for key in self._futures if key[1] == str(path)]:
+            del self._futures[key]
+
+    def __contains__(self, path: Path) -> bool:
+        return any(key[1] == str(path) for key in self._futures)
+
+    def __len__(self):
+        return len(self._futures)
+
+    @staticmethod
+    def progress(futures: list[Future]) -> float:
+        """
+        How much of a group of assets has finished loading, from 0 to 1.
+
+        :param futures: The futures of every asset in the group.
+        """
+
+        if not futures:
+            return 1.0
+        return sum(future.done() for future in futures) / len(futures)
+
+    def _load(self, kind: str, path: Path, loader: Callable[[Path], Any]) -> Future:
+        key = (kind, str(path))
+        if key not in self._futures:
+            self._futures[key] = self._submit(loader, Path(path))
+        return self._futures[key]
+
+    def _submit(self, function: Callable, *args) -> Future:
+        if self._executor is not None:
+            return self._executor.submit(function, *args)
+
+        future = Future()
+
+        async def run():
+            await asyncio.sleep(0)
+            try:
+                future.set_result(function(*args))
+            except Exception as error:
+                future.set_exception(error)
+
+        try:
+            asyncio.get_running_loop().create_task(run())
+        except RuntimeError:
+            # Not inside the game loop yet, so just load it now
+            try:
+                future.set_result(function(*args))
+            except Exception as error:
+                future.set_exception(error)
+        return future
+
+
+LOADER = AssetManager()
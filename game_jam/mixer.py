@@ -0,0 +1,53 @@
+"""
+Sets up the audio mixer before pygame starts, so sounds play with as little delay as
+the sound card allows.
+
+A smaller buffer means each sound reaches the speakers sooner, but too small a buffer
+can crackle on slower computers. Both can be changed in the settings file, and take
+effect the next time the game starts.
+"""
+
+import pygame
+
+from .settings import SETTINGS
+
+FREQUENCY_SETTING = "Audio Frequency"
+BUFFER_SETTING = "Audio Buffer"
+OFFSET_SETTING = "Audio Offset"
+
+# Samples per second, which matches the songs so they don't need resampling
+DEFAULT_FREQUENCY = 44100
+# Samples mixed at a time, about 12 ms at the default frequency
+DEFAULT_BUFFER = 512
+# Signed 16 bit stereo
+SAMPLE_SIZE = -16
+CHANNELS = 2
+
+
+def pre_init_mixer() -> None:
+    """Choose the mixer's settings. Has to be called before pygame.init()."""
+
+    pygame.mixer.pre_init(
+        int(SETTINGS.get(FREQUENCY_SETTING) or DEFAULT_FREQUENCY),
+        SAMPLE_SIZE,
+        CHANNELS,
+        int(SETTINGS.get(BUFFER_SETTING) or DEFAULT_BUFFER),
+    )
+
+
+def buffer_latency() -> float:
+    """How many seconds of sound the mixer's buffer holds, at the settings it's using."""
+
+    frequency = DEFAULT_FREQUENCY
+    if pygame.mixer.get_init():
+        frequency = pygame.mixer.get_init()[0]
+    return int(SETTINGS.get(BUFFER_SETTING) or DEFAULT_BUFFER) / frequency
+
+
+def get_offset() -> float:
+    """
+    How many seconds after a sound is played the player hears it, as measured by the
+    calibration screen.
+    """
+
+    return SETTINGS.get(OFFSET_SETTING) or 0.0
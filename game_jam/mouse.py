@@ -0,0 +1,47 @@
+"""Collects mouse clicks from the event queue so none are missed between frames."""
+
+from collections import deque
+
+import pygame
+
+from .constants import Coordinate
+from .display import to_logical
+
+
+class Mouse:
+    """
+    Every left click since the last update, in the order they happened.
+
+    Clicks come from MOUSEBUTTONDOWN events rather than checking whether the
+    button is held each frame, so several quick clicks in one frame all count.
+    """
+
+    def __init__(self):
+        self._clicks: deque[Coordinate] = deque()
+
+    def handle(self, event: pygame.event.Event) -> Coordinate | None:
+        """
+        Remember the event if it is a left click, at its position on the screen
+        rather than in the window.
+
+        :param event: An event from the pygame event queue.
+        :returns: Where the click was on the screen, or None if it wasn't a click.
+        """
+
+        if event.type == pygame.MOUSEBUTTONDOWN and event.button == pygame.BUTTON_LEFT:
+            position = to_logical(event.pos)
+            self._clicks.append(position)
+            return position
+        return None
+
+    def pop_clicks(self) -> list[Coordinate]:
+        """Gives every click that hasn't been handled yet and forgets them."""
+
+        clicks = list(self._clicks)
+        self._clicks.clear()
+        return clicks
+
+    def clear(self) -> None:
+        """Forget every click that hasn't been handled."""
+
+        self._clicks.clear()
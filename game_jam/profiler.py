@@ -0,0 +1,293 @@
+"""
+Times each part of every frame, and shows the results over the game.
+
+Press F3 to show or hide the overlay, and F4 to start or stop recording a trace.
+Traces are saved to the traces directory as Chrome trace JSON, which can be opened
+in chrome://tracing or https://ui.perfetto.dev, and can also be saved as CSV.
+"""
+
+import csv
+import json
+import time
+from collections import deque
+from pathlib import Path
+from time import perf_counter
+
+import pygame
+
+from .cache import TEXT, TEXTURES
+from .constants import ROOT
+
+TRACES = ROOT / "traces"
+
+# How many recent frames the overlay's statistics are worked out from
+HISTORY = 300
+
+PHASES = (
+    "wait",
+    "events",
+    "on_update",
+    "update_elements",
+    "display_elements",
+    "overlay",
+    "flip",
+    "yield",
+)
+
+
+class _Section:
+    """Times the code inside a `with` block."""
+
+    __slots__ = ("profiler", "phase", "started")
+
+    def __init__(self, profiler: "Profiler", phase: str):
+        self.profiler = profiler
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = perf_counter()
+
+    def __exit__(self, *error):
+        self.profiler.add(self.phase, self.started, perf_counter())
+
+
+class Profiler:
+    """
+    Keeps how long each phase of the recent frames took.
+
+    While recording, every phase of every frame is also kept so it can be saved
+    as a trace.
+    """
+
+    def __init__(self, history: int = HISTORY):
+        """
+        :param history: How many recent frames to keep statistics for.
+        """
+
+        self.history: deque[dict[str, float]] = deque(maxlen=history)
+        self.recording = False
+        self._frame: dict[str, float] = {}
+        self._frame_started = None
+        self._frames: list[dict[str, float]] = []
+        self._events: list[tuple[str, float, float]] = []
+
+    def begin_frame(self) -> None:
+        """Finish timing the last frame, if there was one, and start timing a new one."""
+
+        self.end_frame()
+        self._frame_started = perf_counter()
+        self._frame = {}
+
+    def end_frame(self) -> None:
+        """Finish timing the current frame."""
+
+        if self._frame_started is None:
+            return
+
+        now = perf_counter()
+        self._frame["start"] = self._frame_started
+        self._frame["total"] = now - self._frame_started
+        self.history.append(self._frame)
+        if self.recording:
+            self._frames.append(self._frame)
+            self._events.append(("frame", self._frame_started, now))
+        self._frame_started = None
+
+    def measure(self, phase: str) -> _Section:
+        """
+        Time a phase of the frame, used as `with PROFILER.measure("phase"):`.
+        Phases measured more than once in a frame are added together.
+
+        :param phase: The name of the phase.
+        """
+
+        return _Section(self, phase)
+
+    def add(self, phase: str, started: float, ended: float) -> None:
+        """
+        Count time spent on a phase of the current frame.
+
+        :param phase: The name of the phase.
+        :param started: When the phase started, from `perf_counter`.
+        :param ended: When the phase ended, from `perf_counter`.
+        """
+
+        self._frame[phase] = self._frame.get(phase, 0.0) + ended - started
+        if self.recording:
+            self._events.append((phase, started, ended))
+
+    @property
+    def fps(self) -> float:
+        """The average frame rate over the recent frames."""
+
+        if not self.history:
+            return 0.0
+        return len(self.history) / sum(frame["total"] for frame in self.history)
+
+    @property
+    def work_time(self) -> float:
+        """How long the last frame took to process, not counting waiting, in seconds."""
+
+        if not self.history:
+            return 0.0
+        return self.history[-1]["total"] - self.history[-1].get("wait", 0.0)
+
+    def percentile(self, percent: int) -> float:
+        """
+        How long frames took to process, not counting waiting for the next frame,
+        in milliseconds.
+
+        :param percent: The percentile, from 0 to 100.
+        """
+
+        if not self.history:
+            return 0.0
+        busy = sorted(frame["total"] - frame.get("wait", 0.0) for frame in self.history)
+        return 1000 * busy[percent * (len(busy) - 1) // 100]
+
+    def start_recording(self) -> None:
+        """Start keeping every frame for a trace."""
+
+        self.recording = True
+        self._frames = []
+        self._events = []
+
+    def stop_recording(self, path: Path = None) -> Path:
+        """
+        Stop recording and save the trace.
+
+        :param path: Where to save it. Files ending in .csv are saved as one row per
+            frame, and anything else as Chrome trace JSON. Defaults to a new file in
+            the traces directory.
+        :returns: Where the trace was saved.
+        """
+
+        self.recording = False
+        if path is None:
+            TRACES.mkdir(exist_ok=True)
+            path = TRACES / f"trace-{time.strftime('%Y%m%d-%H%M%S')}.json"
+
+        path = Path(path)
+        if path.suffix == ".csv":
+            self._save_csv(path)
+        else:
+            self._save_chrome_trace(path)
+        return path
+
+    def _save_csv(self, path: Path) -> None:
+        with path.open("w", newline="") as file:
+            writer = csv.writer(file)
+            writer.writerow(["frame", "start_ms", "total_ms"] + [f"{p}_ms" for p in PHASES])
+            first = self._frames[0]["start"] if self._frames else 0.0
+            for i, frame in enumerate(self._frames):
+                writer.writerow(
+                    [i, 1000 * (frame["start"] - first), 1000 * frame["total"]]
+                    + [1000 * frame.get(phase, 0.0) for phase in PHASES]
+                )
+
+    def _save_chrome_trace(self, path: Path) -> None:
+        first = min((started for _, started, _ in self._events), default=0.0)
+        events = [
+            {
+                "name": phase,
+                "ph": "X",
+                "ts": 1e6 * (started - first),
+                "dur": 1e6 * (ended - started),
+                "pid": 1,
+                "tid": 0 if phase == "frame" else 1,
+            }
+            for phase, started, ended in self._events
+        ]
+        with path.open("w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+class Overlay:
+    """Shows the frame rate, frame times, jar count, and cache hit rates in a corner."""
+
+    def __init__(self, profiler: Profiler, font_size=20):
+        """
+        :param profiler: Where the frame times come from.
+        :param font_size: The height of the text, in pixels.
+        """
+
+        self.profiler = profiler
+        self.font_size = font_size
+        self.visible = False
+        self.rect = pygame.Rect(0, 0, 0, 0)
+        # The overlay's own font, so its text never goes through the text cache and
+        # changes the hit rate it shows
+        self._font = None
+
+    def handle(self, event: pygame.event.Event, window) -> None:
+        """
+        Show or hide the overlay on F3, and start or stop recording a trace on F4.
+
+        :param event: An event from the pygame event queue.
+        :param window: The window that is open.
+        """
+
+        if event.type != pygame.KEYDOWN:
+            return
+
+        if event.key == pygame.K_F3:
+            self.visible = not self.visible
+            if not self.visible:
+                window.invalidate()
+        elif event.key == pygame.K_F4:
+            if self.profiler.recording:
+                print(f"Saved trace to {self.profiler.stop_recording()}")
+            else:
+                self.profiler.start_recording()
+
+    def lines(self, window) -> list[str]:
+        """
+        The text to show.
+
+        :param window: The window that is open.
+        """
+
+        jars = getattr(window, "elements", {}).get("Jars")
+        return [
+            f"FPS {self.profiler.fps:.0f}",
+            f"p50 {self.profiler.percentile(50):.2f} ms",
+            f"p99 {self.profiler.percentile(99):.2f} ms",
+            f"Jars {len(jars) if jars is not None else 0}",
+            f"Textures {100 * TEXTURES.hit_rate:.0f}% hit",
+            f"Text {100 * TEXT.hit_rate:.0f}% hit",
+            "REC" if self.profiler.recording else "",
+        ]
+
+    def draw(self, screen: pygame.Surface, window) -> pygame.Rect:
+        """
+        Draw the overlay in the top left corner.
+
+        :param screen: The surface to draw on.
+        :param window: The window that is open.
+        :returns: The area that was drawn over.
+        """
+
+        if self._font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            self._font = pygame.font.Font(None, self.font_size)
+
+        images = [
+            self._font.render(line, True, (255, 255, 255))
+            for line in self.lines(window)
+            if line
+        ]
+        width = max(image.get_width() for image in images) + 10
+        height = sum(image.get_height() for image in images) + 10
+
+        self.rect = pygame.Rect(0, 0, width, height)
+        screen.fill((0, 0, 0), self.rect)
+        y = 5
+        for image in images:
+            screen.blit(image, (5, y))
+            y += image.get_height()
+        return self.rect
+
+
+PROFILER = Profiler()
+OVERLAY = Overlay(PROFILER)
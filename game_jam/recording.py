@@ -0,0 +1,187 @@
+"""
+A compact binary log of a level being played, so it can be replayed exactly.
+
+A recording holds the level's random seed, the time of every frame, every click, and
+every beat a jar was spawned for. See `replay` for playing one back.
+"""
+
+import struct
+from pathlib import Path
+from typing import BinaryIO
+
+from .constants import Coordinate
+
+MAGIC = b"JSRP"
+VERSION = 1
+
+# The magic number, version, seed, start time, leftover update time, and name length
+HEADER = struct.Struct("<4sBQddH")
+# A frame's time, a checksum of the level afterwards, and how many clicks it had
+FRAME = struct.Struct("<cdIB")
+# Where a left click was
+CLICK = struct.Struct("<hh")
+# The time of a beat that had a jar spawned for it, and the song position it spawned at
+BEAT = struct.Struct("<cdd")
+# The final score
+END = struct.Struct("<ci")
+
+
+class Session:
+    """Everything that was recorded while a level was played."""
+
+    def __init__(self, window: str, seed: int, start: float, lag: float):
+        """
+        :param window: The name of the level.
+        :param seed: The seed the level's random numbers came from.
+        :param start: The time the level started at.
+        :param lag: How much update time was left over after the level loaded.
+        """
+
+        self.window = window
+        self.seed = seed
+        self.start = start
+        self.lag = lag
+        self.times: list[float] = []
+        self.checksums: list[int] = []
+        self.clicks: list[list[Coordinate]] = []
+        self.beats: list[tuple[float, float]] = []
+        self.score = None
+
+    def __len__(self):
+        return len(self.times)
+
+
+class SessionRecorder:
+    """Writes a level's session to a file as it's played."""
+
+    def __init__(self, path: Path, window: str, seed: int, start: float):
+        """
+        :param path: The file to write.
+        :param window: The name of the level.
+        :param seed: The seed the level's random numbers came from.
+        :param start: The time the level started at.
+        """
+
+        self.path = Path(path)
+        self.window = window
+        self.seed = seed
+        self.start = start
+        self._file: BinaryIO | None = None
+        self._clicks: list[Coordinate] = []
+        # Anything recorded in the frame the level loaded in, before the file is started
+        self._pending = bytearray()
+
+    @property
+    def started(self) -> bool:
+        """Whether the file has been started."""
+
+        return self._file is not None
+
+    def begin(self, lag: float) -> None:
+        """
+        Start the file, before the first frame after the level loaded.
+
+        :param lag: How much update time was left over after the level loaded.
+        """
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("wb")
+        name = self.window.encode()
+        self._file.write(
+            HEADER.pack(MAGIC, VERSION, self.seed, self.start, lag, len(name)) + name
+        )
+        self._file.write(self._pending)
+        self._pending.clear()
+
+    def click(self, position: Coordinate) -> None:
+        """
+        Record a left click during this frame.
+
+        :param position: Where the click was, on the screen.
+        """
+
+        self._clicks.append(position)
+
+    def frame(self, time: float, checksum: int) -> None:
+        """
+        Record a frame once it's been updated.
+
+        :param time: The time the frame started at.
+        :param checksum: A checksum of the level after the frame's updates.
+        """
+
+        self._file.write(FRAME.pack(b"F", time, checksum, len(self._clicks)))
+        for x, y in self._clicks:
+            self._file.write(CLICK.pack(x, y))
+        self._clicks.clear()
+
+    def beat(self, beat: float, position: float) -> None:
+        """
+        Record a beat that had a jar spawned for it.
+
+        :param beat: The time of the beat, in seconds.
+        :param position: How far into the song playback the jar spawned, in seconds.
+        """
+
+        self._write(BEAT.pack(b"B", beat, position))
+
+    def end(self, score: int) -> None:
+        """
+        Record that the level ended.
+
+        :param score: The final score.
+        """
+
+        self._write(END.pack(b"E", score))
+
+    def close(self) -> None:
+        """Finish the file."""
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, record: bytes) -> None:
+        if self._file is None:
+            self._pending += record
+        else:
+            self._file.write(record)
+
+
+def read_session(path: Path) -> Session:
+    """
+    Load a recording.
+
+    :param path: The recorded file.
+    :raises ValueError: If the file isn't a recording.
+    """
+
+    data = Path(path).read_bytes()
+    magic, version, seed, start, lag, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a version {VERSION} recording")
+
+    offset = HEADER.size
+    session = Session(data[offset : offset + length].decode(), seed, start, lag)
+    offset += length
+    while offset < len(data):
+        tag = data[offset : offset + 1]
+        if tag == b"F":
+            _, frame_time, checksum, count = FRAME.unpack_from(data, offset)
+            offset += FRAME.size
+            clicks = []
+            for _ in range(count):
+                clicks.append(CLICK.unpack_from(data, offset))
+                offset += CLICK.size
+            session.times.append(frame_time)
+            session.checksums.append(checksum)
+            session.clicks.append(clicks)
+        elif tag == b"B":
+            session.beats.append(BEAT.unpack_from(data, offset)[1:])
+            offset += BEAT.size
+        elif tag == b"E":
+            session.score = END.unpack_from(data, offset)[1]
+            offset += END.size
+        else:
+            raise ValueError(f"{path} has an unknown record at byte {offset}")
+    return session
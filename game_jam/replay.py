@@ -0,0 +1,90 @@
+"""
+Plays a recorded level back exactly as it was played, timing every frame.
+
+Replaying a recording on its recorded frame times gives the same jars and the same
+score, so the same session can be timed before and after a change. Record by starting
+the game with:
+    py -m main --record sessions
+and replay a recording with:
+    py -m game_jam.replay sessions/<recording>.jsr
+"""
+
+# Must come first so pygame starts with the dummy drivers
+from . import headless
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+from time import perf_counter
+
+import pygame
+
+from .clock import ReplayClock
+from .recording import Session, read_session
+
+
+async def replay(game, session: Session) -> tuple[list[headless.FrameTime], int]:
+    """
+    Play a recording back on its recorded frame times, timing each frame.
+
+    :param game: The Game object to run.
+    :param session: The recording.
+    :returns: How long updating and drawing took for each frame, and how many
+        frames ended with the level different from when it was recorded.
+    """
+
+    game.clock = ReplayClock(session.start, session.times)
+    game.replay = session
+    game.start()
+
+    window = game.get_window(session.window)
+    for future in window.prefetch():
+        future.result()
+    game.open(session.window)
+    # The level's spawner first runs at the end of the frame it loaded in
+    await asyncio.sleep(0)
+
+    times = []
+    mismatches = 0
+    for clicks, checksum in zip(session.clicks, session.checksums):
+        for position in clicks:
+            pygame.event.post(headless.click(position))
+
+        started = perf_counter()
+        game.update()
+        updated = perf_counter()
+        game.draw()
+        times.append((updated - started, perf_counter() - updated))
+        mismatches += window.checksum() != checksum
+
+        await asyncio.sleep(0)
+
+    game.replay = None
+    return times, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded level and time it.")
+    parser.add_argument("recording", type=Path, help="the recorded .jsr file")
+    parser.add_argument("--output", help="also save every frame's times to this file")
+    args = parser.parse_args()
+
+    from main import my_game
+
+    session = read_session(args.recording)
+    times, mismatches = asyncio.run(replay(my_game, session))
+    summary = headless.summarize(times)
+    window = my_game.get_window(session.window)
+    summary["score"] = window.score
+    summary["recorded_score"] = session.score
+    summary["mismatched_frames"] = mismatches
+    print(json.dumps(summary, indent=2))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump({"summary": summary, "frames": times}, file)
+
+
+if __name__ == "__main__":
+    main()
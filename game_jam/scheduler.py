@@ -0,0 +1,165 @@
+"""Keeps track of the song's playback time and which beats are due to spawn a jar."""
+
+from collections import deque
+from time import perf_counter
+from typing import Callable
+
+
+class SongClock:
+    """
+    How far into the song playback is, in seconds.
+
+    Time spent paused isn't counted, so the clock stays lined up with the music.
+    """
+
+    def __init__(self, time: Callable[[], float] = perf_counter):
+        """
+        :param time: Gives the current time in seconds.
+        """
+
+        self._time = time
+        self._started = None
+        self._paused_at = None
+        self._time_paused = 0.0
+
+    def start(self) -> None:
+        """Start counting from zero."""
+
+        self._started = self._time()
+        self._paused_at = None
+        self._time_paused = 0.0
+
+    def pause(self) -> None:
+        """Stop the clock until `resume` is called."""
+
+        if self._paused_at is None:
+            self._paused_at = self._time()
+
+    def resume(self) -> None:
+        """Continue counting after a pause."""
+
+        if self._paused_at is not None:
+            self._time_paused += self._time() - self._paused_at
+            self._paused_at = None
+
+    @property
+    def paused(self) -> bool:
+        """Whether the clock is currently stopped."""
+
+        return self._paused_at is not None
+
+    @property
+    def position(self) -> float:
+        """The number of seconds the song has been playing for."""
+
+        if self._started is None:
+            return 0.0
+
+        now = self._time() if self._paused_at is None else self._paused_at
+        return now - self._started - self._time_paused
+
+
+class BeatScheduler:
+    """
+    Walks through a song's beats and says which jars should be spawned.
+
+    A jar is spawned `lead_time` seconds before its beat, so it reaches the
+    hit line right as the beat plays.
+    """
+
+    def __init__(self, timestamps: list[float], lead_time: float = 0.0, lookahead=8):
+        """
+        :param timestamps: The time of each beat in the song, in seconds.
+        :param lead_time: How many seconds before its beat a jar should spawn.
+        :param lookahead: How many upcoming beats to keep queued at once.
+        """
+
+        self.timestamps = sorted(timestamps)
+        self.lead_time = lead_time
+        self._cursor = 0
+        self._upcoming: deque[float] = deque(maxlen=lookahead)
+
+    def due(self, position: float) -> list[float]:
+        """
+        Gives every beat whose jar should have spawned by now, oldest first.
+
+        :param position: How far into the song playback is, in seconds.
+        """
+
+        due = []
+        self._fill()
+        while self._upcoming and self._upcoming[0] - self.lead_time <= position:
+            due.append(self._upcoming.popleft())
+            self._fill()
+        return due
+
+    def lateness(self, beat: float, position: float) -> float:
+        """
+        How many seconds ago the jar for a beat should have spawned.
+
+        :param beat: The time of the beat, in seconds.
+        :param position: How far into the song playback is, in seconds.
+        """
+
+        return max(position - (beat - self.lead_time), 0.0)
+
+    @property
+    def finished(self) -> bool:
+        """Whether every beat has been spawned."""
+
+        return self._cursor >= len(self.timestamps) and not self._upcoming
+
+    def __len__(self):
+        return len(self.timestamps) - self._cursor + len(self._upcoming)
+
+    def _fill(self) -> None:
+        while len(self._upcoming) < self._upcoming.maxlen and self._cursor < len(
+            self.timestamps
+        ):
+            self._upcoming.append(self.timestamps[self._cursor])
+            self._cursor += 1
+
+
+class RecordedBeats(BeatScheduler):
+    """
+    Gives the beats of a recording at exactly the song positions they were spawned
+    at, even ones that were found late while the song was playing.
+    """
+
+    def __init__(
+        self,
+        beats: list[tuple[float, float]],
+        lead_time: float = 0.0,
+        complete: bool = True,
+    ):
+        """
+        :param beats: Each beat's time and the position it was spawned at, in seconds.
+        :param lead_time: How many seconds before its beat a jar should spawn.
+        :param complete: Whether the recording has every beat, rather than stopping
+            partway through the level.
+        """
+
+        super().__init__([beat for beat, _ in beats], lead_time)
+        self.beats = deque(beats)
+        self.complete = complete
+
+    def due(self, position: float) -> list[float]:
+        """
+        Gives every beat that was spawned by this position, oldest first.
+
+        :param position: How far into the song playback is, in seconds.
+        """
+
+        due = []
+        while self.beats and self.beats[0][1] <= position:
+            due.append(self.beats.popleft()[0])
+        return due
+
+    @property
+    def finished(self) -> bool:
+        """Whether every beat has been spawned, and the recording had no more."""
+
+        return self.complete and not self.beats
+
+    def __len__(self):
+        return len(self.beats)
@@ -0,0 +1,124 @@
+"""Keeps the player's settings in memory and saves them back to disk."""
+
+import atexit
+import json
+import os
+from pathlib import Path
+from time import perf_counter
+from typing import Callable
+
+from .constants import GAME_JAM
+
+SETTINGS_FILE = GAME_JAM / "settings.json"
+
+# How long to wait after the last change before writing to disk, in seconds
+SAVE_DELAY = 1.0
+
+Listener = Callable[[str, float], None]
+
+
+class Settings:
+    """
+    The settings file, loaded once and read from memory.
+
+    Changes are saved once no other change has been made for a short delay, so
+    clicking a volume button several times only writes the file once.
+    """
+
+    def __init__(self, path: Path, save_delay: float = SAVE_DELAY):
+        """
+        :param path: The JSON file the settings are stored in.
+        :param save_delay: How many seconds to wait after a change before saving.
+        """
+
+        self.path = path
+        self.save_delay = save_delay
+        self._data: dict[str, float] | None = None
+        self._changed_at: float | None = None
+        self._listeners: dict[str | None, list[Listener]] = {}
+
+    @property
+    def data(self) -> dict[str, float]:
+        """Every setting, loaded from the file the first time it's needed."""
+
+        if self._data is None:
+            with self.path.open() as file:
+                self._data = json.load(file)
+        return self._data
+
+    def get(self, key: str) -> float:
+        """
+        Get the value of a setting.
+
+        :param key: The name of the setting.
+        """
+
+        return self.data.get(key)
+
+    def set(self, key: str, value: float) -> None:
+        """
+        Change a setting and tell anything listening to it.
+
+        :param key: The name of the setting.
+        :param value: The new value of the setting.
+        """
+
+        if self.data.get(key) == value:
+            return
+
+        self.data[key] = value
+        self._changed_at = perf_counter()
+
+        for listener in self._listeners.get(key, []) + self._listeners.get(None, []):
+            listener(key, value)
+
+    def subscribe(self, listener: Listener, key: str = None) -> None:
+        """
+        Call a function whenever a setting changes.
+
+        :param listener: Called with the name and new value of the setting.
+        :param key: The setting to listen to, or None to hear about every setting.
+        """
+
+        self._listeners.setdefault(key, []).append(listener)
+
+    def unsubscribe(self, listener: Listener, key: str = None) -> None:
+        """
+        Stop calling a function that was given to `subscribe`.
+
+        :param listener: The function to remove.
+        :param key: The setting it was listening to.
+        """
+
+        listeners = self._listeners.get(key, [])
+        if listener in listeners:
+            listeners.remove(listener)
+
+    @property
+    def unsaved(self) -> bool:
+        """Whether there are changes that haven't been written to disk yet."""
+
+        return self._changed_at is not None
+
+    def save_if_due(self) -> None:
+        """Save the settings if nothing has changed for long enough. Called each frame."""
+
+        if self.unsaved and perf_counter() - self._changed_at >= self.save_delay:
+            self.save()
+
+    def save(self) -> None:
+        """Write any unsaved changes to the file."""
+
+        if not self.unsaved:
+            return
+
+        # Write everything to a new file first, so a crash can't leave the file half written
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with temporary.open("w") as file:
+            json.dump(self._data, file)
+        os.replace(temporary, self.path)
+        self._changed_at = None
+
+
+SETTINGS = Settings(SETTINGS_FILE)
+atexit.register(SETTINGS.save)
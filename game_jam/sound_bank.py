@@ -0,0 +1,129 @@
+"""Sound effects that are decoded ahead of time and played on reserved channels."""
+
+from pathlib import Path
+from time import perf_counter
+
+import pygame
+
+from .settings import SETTINGS
+
+VOLUME_SETTING = "Effects Volume"
+
+
+class SoundBank:
+    """
+    Holds every sound effect, decoded once, and the mixer channels they play on.
+
+    When every channel is busy, the sound that has been playing the longest is
+    cut off to make room for the new one.
+    """
+
+    def __init__(self, channels: int = 4, steal: bool = True):
+        """
+        :param channels: How many mixer channels to reserve for sound effects.
+        :param steal: Whether to cut off the oldest sound when every channel is busy,
+            rather than not playing the new one.
+        """
+
+        self.channel_count = channels
+        self.steal = steal
+
+        self.played = 0
+        self.stolen = 0
+        self.dropped = 0
+
+        self._sounds: dict[str, pygame.mixer.Sound] = {}
+        self._paths: dict[str, Path] = {}
+        self._channels: list[pygame.mixer.Channel] = []
+        self._started: list[float] = []
+        self._volume = None
+
+        SETTINGS.subscribe(self._on_volume_change, VOLUME_SETTING)
+
+    def load(self, name: str, path: Path, sound: pygame.mixer.Sound = None) -> None:
+        """
+        Decode a sound effect so it is ready to play. Does nothing if it's already loaded.
+
+        :param name: What the sound will be played by.
+        :param path: The file path to the sound.
+        :param sound: The sound, if it was already decoded from the path.
+        """
+
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        if not self._channels:
+            self._reserve()
+        if self._paths.get(name) == path:
+            return
+
+        if sound is None:
+            sound = pygame.mixer.Sound(path)
+        sound.set_volume(self.volume)
+        self._sounds[name] = sound
+        self._paths[name] = path
+
+    def play(self, name: str) -> pygame.mixer.Channel | None:
+        """
+        Play a loaded sound effect.
+
+        :param name: The name the sound was loaded with.
+        :returns: The channel the sound is playing on, or None if it couldn't be played.
+        """
+
+        sound = self._sounds.get(name)
+        if sound is None or not self._channels:
+            self.dropped += 1
+            return None
+
+        index = self._free_channel()
+        if index is None:
+            self.dropped += 1
+            return None
+
+        channel = self._channels[index]
+        channel.play(sound)
+        self._started[index] = perf_counter()
+        self.played += 1
+        return channel
+
+    @property
+    def volume(self) -> float:
+        """The effects volume from the settings."""
+
+        if self._volume is None:
+            self._volume = SETTINGS.get(VOLUME_SETTING)
+        return self._volume
+
+    @property
+    def stats(self) -> dict[str, int]:
+        """How many sounds were played, cut off, and skipped."""
+
+        return {"played": self.played, "stolen": self.stolen, "dropped": self.dropped}
+
+    def _reserve(self) -> None:
+        if pygame.mixer.get_num_channels() < self.channel_count:
+            pygame.mixer.set_num_channels(self.channel_count)
+        pygame.mixer.set_reserved(self.channel_count)
+        self._channels = [pygame.mixer.Channel(i) for i in range(self.channel_count)]
+        self._started = [0.0] * self.channel_count
+
+    def _free_channel(self) -> int | None:
+        for index, channel in enumerate(self._channels):
+            if not channel.get_busy():
+                return index
+
+        if not self.steal:
+            return None
+
+        oldest = min(range(len(self._started)), key=self._started.__getitem__)
+        self._channels[oldest].stop()
+        self.stolen += 1
+        return oldest
+
+    def _on_volume_change(self, key: str, volume: float) -> None:
+        self._volume = volume
+        for sound in self._sounds.values():
+            sound.set_volume(volume)
+
+
+EFFECTS = SoundBank()
@@ -0,0 +1,399 @@
+"""
+Finds beats in songs while they play, for levels that go on forever.
+
+Instead of analyzing a whole song before it starts, a worker decodes and analyzes it a
+block at a time and hands the beats over through a small queue. The worker waits
+whenever the queue is full, so it never gets far ahead of the music, and only the
+block it's analyzing is kept in memory.
+"""
+
+import io
+import itertools
+import math
+import queue
+import struct
+import sys
+import threading
+from collections import deque
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+import numpy as np
+import pygame
+
+# How many seconds of audio are analyzed at once
+CHUNK = 0.5
+# How many beats can wait in the queue before the worker stops to let them be used
+QUEUE_SIZE = 64
+# Comes after each block of a song is analyzed, so there's a chance to stop in between
+BLOCK_END = object()
+
+# A song starting, at this many seconds into the stream
+SongStart = tuple[float, Path]
+
+
+class OnsetDetector:
+    """
+    Finds the start of each note in audio that arrives a piece at a time.
+
+    A note starts wherever the spectrum gets suddenly louder (the spectral flux) by
+    more than is usual for the last second or so of the song.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int,
+        frame_size=2048,
+        hop=512,
+        sensitivity=1.5,
+        min_gap=0.3,
+    ):
+        """
+        :param sample_rate: How many samples there are per second.
+        :param frame_size: How many samples each spectrum is taken from.
+        :param hop: How many samples apart each spectrum is taken.
+        :param sensitivity: How many times louder than usual a change has to be to
+            count as a note.
+        :param min_gap: The fewest seconds allowed between two notes, so there is
+            time to click on each jar.
+        """
+
+        self.sample_rate = sample_rate
+        self.frame_size = frame_size
+        self.hop = hop
+        self.sensitivity = sensitivity
+        self.min_gap = min_gap
+
+        self._window = np.hanning(frame_size).astype(np.float32)
+        self._samples = np.zeros(0, dtype=np.float32)
+        self._spectrum = None
+        self._frame = 0
+        self._last_onset = -math.inf
+
+        # The recent flux, to compare new flux with
+        self._history: deque[float] = deque(maxlen=max(sample_rate // hop, 1))
+        self._history_total = 0.0
+        # The last two flux values, since a peak is only known once it's passed
+        self._before = self._peak = 0.0
+
+    def process(self, samples: np.ndarray) -> list[float]:
+        """
+        Analyze the next piece of audio.
+
+        :param samples: Mono samples, following on from the last ones.
+        :returns: The time of each note found, in seconds from the start of the audio.
+        """
+
+        self._samples = np.concatenate((self._samples, samples.astype(np.float32)))
+        count = (len(self._samples) - self.frame_size) // self.hop + 1
+        if count <= 0:
+            return []
+
+        frames = np.lib.stride_tricks.sliding_window_view(
+            self._samples, self.frame_size
+        )[:: self.hop][:count]
+        spectra = np.log1p(10 * np.abs(np.fft.rfft(frames * self._window, axis=1)))
+        previous = np.vstack(
+            (spectra[:1] if self._spectrum is None else self._spectrum, spectra[:-1])
+        )
+        flux = np.maximum(spectra - previous, 0).sum(axis=1)
+
+        self._spectrum = spectra[-1:]
+        self._samples = self._samples[count * self.hop :]
+
+        onsets = []
+        for value in flux.tolist():
+            onset = self._pick(value)
+            if onset is not None:
+                onsets.append(onset)
+            self._frame += 1
+        return onsets
+
+    def _pick(self, value: float) -> float | None:
+        # The frame before this one is a note if it's a peak that stands out
+        peak_time = (self._frame - 1) * self.hop / self.sample_rate
+        usual = self._history_total / len(self._history) if self._history else 0.0
+        onset = None
+        if (
+            self._before < self._peak >= value
+            and self._peak > self.sensitivity * usual
+            and peak_time - self._last_onset >= self.min_gap
+        ):
+            onset = self._last_onset = peak_time
+
+        if len(self._history) == self._history.maxlen:
+            self._history_total -= self._history[0]
+        self._history.append(value)
+        self._history_total += value
+        self._before, self._peak = self._peak, value
+        return onset
+
+
+def read_blocks(path: Path, length: float = CHUNK) -> Iterator[np.ndarray]:
+    """
+    Decode a song with the mixer a block at a time, so only a little of it is in memory.
+
+    Ogg Vorbis songs are read a page at a time, and each block is decoded from the
+    song's header pages followed by the next few pages. The page before them is
+    decoded too, since the first samples of a page depend on it. Other songs are
+    decoded whole, as one block.
+
+    :param path: The song to decode.
+    :param length: The fewest seconds each block should be, unless the song ends.
+    :returns: The samples of each block, one row per sample and one column per
+        channel, at the mixer's frequency.
+    """
+
+    frequency, _, _ = pygame.mixer.get_init()
+    with open(path, "rb") as file:
+        pages = _ogg_pages(file)
+        headers = []
+        for granule, page in pages:
+            if granule != 0:
+                # The first page of audio
+                break
+            headers.append(page)
+        else:
+            granule = page = None
+
+        rate = _vorbis_rate(headers[0]) if headers and page else None
+        if rate is None:
+            yield _decode(path)
+            return
+
+        header = b"".join(headers)
+        block = []
+        previous = b""
+        # Where the block starts and ends, in samples at the song's own rate
+        start = end = 0
+        # How many samples have been given out, at the mixer's frequency
+        decoded = 0
+        for granule, page in itertools.chain([(granule, page)], pages):
+            block.append(page)
+            # Pages that no packet ends on have no position of their own
+            if granule > end:
+                end = granule
+            if end - start < length * rate:
+                continue
+
+            samples = _decode(io.BytesIO(header + previous + b"".join(block)))
+            position = round(end * frequency / rate)
+            yield _line_up(samples, position - decoded)
+            previous, block, start, decoded = block[-1], [], end, position
+
+        if block:
+            samples = _decode(io.BytesIO(header + previous + b"".join(block)))
+            yield _line_up(samples, round(end * frequency / rate) - decoded)
+
+
+def _ogg_pages(file: BinaryIO) -> Iterator[tuple[int, bytes]]:
+    # Each page is a header with the page's position, then a table of segment lengths
+    while file.read(4) == b"OggS":
+        header = b"OggS" + file.read(23)
+        granule = struct.unpack_from("<q", header, 6)[0]
+        table = file.read(header[26])
+        yield granule, header + table + file.read(sum(table))
+
+
+def _vorbis_rate(page: bytes) -> int | None:
+    packet = page[27 + page[26] :]
+    if not packet.startswith(b"\x01vorbis"):
+        return None
+    return struct.unpack_from("<I", packet, 12)[0]
+
+
+def _decode(song: Path | BinaryIO) -> np.ndarray:
+    samples = pygame.sndarray.samples(pygame.mixer.Sound(song))
+    if samples.ndim == 1:
+        samples = samples[:, np.newaxis]
+    return samples
+
+
+def _line_up(samples: np.ndarray, length: int) -> np.ndarray:
+    # Keep the end of the block where its last page ends, since the page before it and
+    # resampling to the mixer's frequency change how many samples come out
+    if len(samples) >= length:
+        return samples[len(samples) - length :]
+    padding = np.zeros((length - len(samples), samples.shape[1]), samples.dtype)
+    return np.concatenate((padding, samples))
+
+
+def analyze(songs: Iterable[Path]) -> Iterator[float | SongStart | object]:
+    """
+    Find the beats of songs played one after another, a block at a time.
+
+    :param songs: The songs, in the order they play. This can go on forever.
+    :returns: When each song starts, followed by each of its beats, in seconds from
+        the start of the first song. `BLOCK_END` comes after each block's beats.
+    """
+
+    frequency, _, _ = pygame.mixer.get_init()
+    chunk = int(CHUNK * frequency)
+    start = 0.0
+    for song in songs:
+        yield start, song
+
+        detector = OnsetDetector(frequency)
+        length = 0
+        for samples in read_blocks(song):
+            scale = 1 / np.iinfo(samples.dtype).max if samples.dtype.kind == "i" else 1
+            for i in range(0, len(samples), chunk):
+                mono = samples[i : i + chunk].mean(axis=1) * scale
+                for onset in detector.process(mono):
+                    yield start + onset
+            length += len(samples)
+            yield BLOCK_END
+
+        start += length / frequency
+
+
+class BeatStream:
+    """
+    Beats found while the songs play, given out like a `BeatScheduler` gives them.
+
+    The beats are found by a worker thread. Without one, like in the browser build,
+    they're found a block at a time whenever more are needed, so finding them never
+    holds up a frame for long.
+    """
+
+    def __init__(
+        self,
+        songs: Iterable[Path],
+        lead_time: float = 0.0,
+        lookahead=8,
+        queue_size=QUEUE_SIZE,
+    ):
+        """
+        :param songs: The songs, in the order they play. This can go on forever.
+        :param lead_time: How many seconds before its beat a jar should spawn.
+        :param lookahead: How many upcoming beats to keep ready at once.
+        :param queue_size: How many beats the worker can find ahead of time.
+        """
+
+        self.lead_time = lead_time
+        self._items = analyze(songs)
+        self._queue: queue.Queue = queue.Queue(queue_size)
+        self._upcoming: deque[float] = deque()
+        self._lookahead = lookahead
+        self._songs: deque[SongStart] = deque()
+        self._stopped = threading.Event()
+        self._done = False
+        self._error = None
+        self._worker = None
+
+    def start(self) -> None:
+        """Start finding beats."""
+
+        if sys.platform != "emscripten" and self._worker is None:
+            self._worker = threading.Thread(
+                target=self._work, name="beat stream", daemon=True
+            )
+            self._worker.start()
+
+    def stop(self) -> None:
+        """Stop finding beats and let go of the song being analyzed."""
+
+        self._stopped.set()
+        if self._worker is not None:
+            self._worker.join()
+            self._worker = None
+        self._items.close()
+
+    @property
+    def working(self) -> bool:
+        """Whether beats are being found on a background thread."""
+
+        return self._worker is not None and self._worker.is_alive()
+
+    def due(self, position: float) -> list[float]:
+        """
+        Gives every beat whose jar should have spawned by now, oldest first.
+
+        :param position: How far into the stream playback is, in seconds.
+        :raises Exception: Anything that went wrong finding the beats.
+        """
+
+        due = []
+        self._fill()
+        while self._upcoming and self._upcoming[0] - self.lead_time <= position:
+            due.append(self._upcoming.popleft())
+            self._fill()
+        return due
+
+    def lateness(self, beat: float, position: float) -> float:
+        """
+        How many seconds ago the jar for a beat should have spawned.
+
+        :param beat: The time of the beat, in seconds.
+        :param position: How far into the stream playback is, in seconds.
+        """
+
+        return max(position - (beat - self.lead_time), 0.0)
+
+    def song_at(self, position: float) -> SongStart | None:
+        """
+        The song that should be playing.
+
+        :param position: How far into the stream playback is, in seconds.
+        :returns: When the song started and its path, or None before the first song
+            has started being analyzed.
+        """
+
+        self._fill()
+        while len(self._songs) > 1 and self._songs[1][0] <= position:
+            self._songs.popleft()
+        return self._songs[0] if self._songs else None
+
+    @property
+    def finished(self) -> bool:
+        """Whether every song has been played through and every beat spawned."""
+
+        return self._done and self._queue.empty() and not self._upcoming
+
+    def __len__(self):
+        return len(self._upcoming)
+
+    def _fill(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+        while len(self._upcoming) < self._lookahead and not self._done:
+            try:
+                item = self._queue.get_nowait() if self._worker else self._next()
+            except queue.Empty:
+                break
+
+            if item is None:
+                self._done = True
+            elif item is BLOCK_END:
+                # Only the inline analysis gives these, and one block is enough for now
+                break
+            elif isinstance(item, tuple):
+                self._songs.append(item)
+            else:
+                self._upcoming.append(item)
+
+    def _next(self) -> float | SongStart | object | None:
+        try:
+            return next(self._items)
+        except StopIteration:
+            return None
+
+    def _work(self) -> None:
+        try:
+            for item in self._items:
+                if item is not BLOCK_END and not self._put(item):
+                    return
+        except Exception as error:
+            self._error = error
+        self._put(None)
+
+    def _put(self, item: float | SongStart | None) -> bool:
+        # Wait for room in the queue, unless the stream is stopped in the meantime
+        while not self._stopped.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
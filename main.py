@@ -1,11 +1,25 @@
 """Entry point of the game."""
 
+import argparse
 import asyncio
+import random
 import sys
+import time
+from pathlib import Path
 
 import pygame
 
-from game_jam.constants import WIDTH, HEIGHT, FPS, SPRITES, NAME, SOUNDS
+from game_jam.constants import (
+    WIDTH,
+    HEIGHT,
+    FPS,
+    MAX_FRAME_TIME,
+    TIMESTEP,
+    SPRITES,
+    NAME,
+    SOUNDS,
+    SONGS,
+)
 from game_jam.events import (
     open_window,
     exit_game,
@@ -14,10 +28,22 @@ from game_jam.events import (
     decrease_volume,
     update_volume,
     reset_volume,
+    cycle_scaling,
+    update_scaling,
     update_scoreboard,
+    prefetch_levels,
 )
-from game_jam.gameplay import Level
-from game_jam.gui import Window, Button, TextButton
+from game_jam.calibration import CalibrationScreen
+from game_jam.clock import FrameClock
+from game_jam.display import adjust_scaling, get_screen, present, set_scaling
+from game_jam.gameplay import Level, EndlessLevel
+from game_jam.gui import Window, Button, TextButton, LoadingScreen
+from game_jam import lifecycle
+from game_jam.mixer import pre_init_mixer
+from game_jam.mouse import Mouse
+from game_jam.profiler import OVERLAY, PROFILER
+from game_jam.recording import Session, SessionRecorder
+from game_jam.settings import SETTINGS
 
 
 class Game:
@@ -26,34 +52,116 @@ class Game:
     def __init__(self):
         self.windows = {}
         self.running_window = None
-        self._clock = pygame.time.Clock()
+        self.mouse = Mouse()
+        self.clock = FrameClock()
+        # The time the current frame started at, which everything in the frame uses
+        self.now = 0.0
+        # How long it was since the last frame started, which is when this frame's
+        # events could have happened
+        self.frame_time = 0.0
 
-        pygame.init()
+        # Levels are recorded to this folder when it's set
+        self.record_to: Path | None = None
+        self.recorder: SessionRecorder | None = None
+        # The recording being played back, if there is one
+        self.replay: Session | None = None
+
+        # Gameplay is updated in fixed steps, however long each frame takes to draw
+        self._lag = 0.0
+        self._previous_time = None
+
+        SETTINGS.subscribe(lambda key, preset: set_scaling(preset), "Scaling")
 
     async def run(self):
+        self.start()
         while True:
-            window = self.get_window(self.running_window)
+            self.update()
+            self.draw()
+            with PROFILER.measure("yield"):
+                await asyncio.sleep(0)
+
+    def start(self) -> None:
+        """Open the game window and get ready for the first frame."""
+
+        pre_init_mixer()
+        pygame.init()
+        # The mixer is started once, and kept for every level after
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        set_scaling(SETTINGS.get("Scaling") or "nearest")
+        get_screen()
+        self._lag = 0.0
+        self._previous_time = self.now = self.clock.time()
 
-            self._clock.tick(FPS)
+    def update(self) -> None:
+        """Wait for the next frame, handle events, and run any gameplay updates due."""
 
+        if self.recorder is not None and not self.recorder.started:
+            self.recorder.begin(self._lag)
+
+        PROFILER.begin_frame()
+        adjust_scaling(PROFILER.work_time)
+        with PROFILER.measure("wait"):
+            self.clock.tick(FPS)
+
+        self.now = self.clock.time()
+        self.frame_time = self.now - self._previous_time
+        self._lag += min(self.frame_time, MAX_FRAME_TIME)
+        self._previous_time = self.now
+
+        with PROFILER.measure("events"):
             for event in pygame.event.get():
                 if event.type == pygame.QUIT:
                     self.exit()
+                position = self.mouse.handle(event)
+                if position is not None and self.recorder is not None:
+                    self.recorder.click(position)
+                OVERLAY.handle(event, self.get_window(self.running_window))
+                lifecycle.handle(event, self)
+
+        while self._lag >= TIMESTEP:
+            window = self.get_window(self.running_window)
+            window.save_positions()
+            with PROFILER.measure("on_update"):
+                window.on_update()
+            with PROFILER.measure("update_elements"):
+                window.update_elements(self)
+            self._lag -= TIMESTEP
+
+        # A level loaded partway through this frame is recorded from the next one
+        if self.recorder is not None and self.recorder.started:
+            self.record_frame()
+
+    def draw(self) -> None:
+        """Draw the current window, between the last two gameplay updates."""
 
-            window.on_update()
-            window.update_elements(self)
-            window.display_elements()
+        window = self.get_window(self.running_window)
+        with PROFILER.measure("display_elements"):
+            dirty = window.display_elements(self._lag / TIMESTEP)
 
-            await asyncio.sleep(0)
+        if OVERLAY.visible:
+            with PROFILER.measure("overlay"):
+                rect = OVERLAY.draw(get_screen(), window)
+                window.draw_over(rect)
+                if dirty is not None:
+                    dirty.append(rect)
+
+        with PROFILER.measure("flip"):
+            present(dirty)
+        SETTINGS.save_if_due()
 
     def get_window(self, name) -> Window:
         """
-        Retrieve the window object with the given name.
+        Retrieve the window object with the given name. Each window is created the
+        first time it's needed.
 
         :param name: The name of the window.
         :returns: The desired Window object.
         """
-        return self.windows.get(name)
+        window = self.windows.get(name)
+        if window is not None and not isinstance(window, Window):
+            window = self.windows[name] = window()
+        return window
 
     def open(self, name) -> None:
         """
@@ -62,19 +170,70 @@ class Game:
         :param name: The name of the window to display.
         """
 
+        previous = self.get_window(self.running_window)
+        if isinstance(previous, Level) and self.running_window != name:
+            # Only one level is loaded at a time, since the others aren't being drawn
+            previous.unload()
+            lifecycle.check_unloaded(self.running_window, previous)
+
         self.running_window = name
         pygame.display.set_caption(f"{NAME} | {name}")
 
         window = self.get_window(name)
+        if isinstance(window, Level) and not window.ready:
+            # Show the loading screen until everything the level needs is ready
+            loading = self.get_window("Loading")
+            loading.wait_for(window.prefetch(), name)
+            name, window = "Loading", loading
+            self.running_window = name
+            pygame.display.set_caption(f"{NAME} | {name}")
+
+        window.invalidate()
         if isinstance(window, Level):
-            window.load()
+            self.load_level(name, window)
+
+    def load_level(self, name: str, level: Level) -> None:
+        """
+        Start a level over, recording it if recording is on.
 
-    @staticmethod
-    def exit() -> None:
+        :param name: The name of the level.
+        :param level: The level to load.
+        """
+
+        if self.replay is not None:
+            # Pick up exactly where the recorded frame the level loaded in left off
+            seed = self.replay.seed
+            self._lag = self.replay.lag
+        else:
+            seed = random.randrange(2**32)
+        level.enter(seed)
+
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+        if self.record_to is not None:
+            stem = f"{name.lower().replace(' ', '-')}-{time.strftime('%Y%m%d-%H%M%S')}"
+            self.recorder = SessionRecorder(
+                self.record_to / f"{stem}.jsr", name, seed, self.now
+            )
+
+    def record_frame(self) -> None:
+        """Record the frame that was just updated, and stop once the level is left."""
+
+        level = self.get_window(self.recorder.window)
+        self.recorder.frame(self.now, level.checksum())
+        if self.running_window != self.recorder.window:
+            self.recorder.close()
+            self.recorder = None
+
+    def exit(self) -> None:
         """
         End the game.
         """
 
+        if self.recorder is not None:
+            self.recorder.close()
+        SETTINGS.save()
         pygame.quit()
         sys.exit()
 
@@ -82,10 +241,11 @@ class Game:
 my_game = Game()
 
 # The entire gui is defined in this dictionary. Each key is the name of the element, and the
-# value is an instance of the Window class (or Level, since it inherits from Window). Each Window
-# is made up of Elements, defined as another dictionary.
+# value is a function that creates an instance of the Window class (or Level, since it inherits
+# from Window) the first time it's opened. Each Window is made up of Elements, defined as another
+# dictionary.
 my_game.windows = {
-    "Menu": Window(
+    "Menu": lambda: Window(
         SPRITES / "sbg.png",
         {
             "open": Button(
@@ -108,7 +268,7 @@ my_game.windows = {
             ),
         },
     ),
-    "Level Selector": Window(
+    "Level Selector": lambda: Window(
         SPRITES / "bg.png",
         {
             "Level One": Button(
@@ -136,7 +296,7 @@ my_game.windows = {
                 SPRITES / "endlessButton.png",
                 (4 * WIDTH // 5 - 100, HEIGHT // 4),
                 scale=3,
-                on_click=open_window(my_game, "Menu"),
+                on_click=open_window(my_game, "Endless Mode"),
             ),
             "Back": Button(
                 SPRITES / "backButton.png",
@@ -145,8 +305,11 @@ my_game.windows = {
                 on_click=open_window(my_game, "Menu"),
             ),
         },
+        on_update=prefetch_levels(
+            my_game, ["Level One", "Level Two", "Level Three", "Endless Mode"]
+        ),
     ),
-    "Settings": Window(
+    "Settings": lambda: Window(
         SPRITES / "bg.png",
         {
             "Increase song volume": TextButton(
@@ -191,28 +354,42 @@ my_game.windows = {
                 on_update=update_volume(my_game, "Settings", "Effects"),
                 on_click=reset_volume("Effects"),
             ),
+            "Scaling": TextButton(
+                "Scaling: Nearest",
+                (WIDTH // 2 - 150, 400, 300, 50),
+                on_update=update_scaling(my_game, "Settings"),
+                on_click=cycle_scaling(),
+            ),
+            "Calibrate": TextButton(
+                "Calibrate audio",
+                (WIDTH // 2 - 150, 500, 300, 50),
+                on_click=open_window(my_game, "Calibration"),
+            ),
             "Back": TextButton(
                 "Back",
-                (WIDTH // 2 - 100, 400, 200, 50),
+                (WIDTH // 2 - 100, 600, 200, 50),
                 on_click=open_window(my_game, "Menu"),
             ),
         },
     ),
-    "Level One": Level(
+    "Level One": lambda: Level(
         my_game,
         SOUNDS / "ode-to-joy.ogg",
     ),
-    "Level Two": Level(
+    "Level Two": lambda: Level(
         my_game,
         SOUNDS / "rushE.ogg",
-        speed=7,
+        speed=420,
     ),
-    "Level Three": Level(
+    "Level Three": lambda: Level(
         my_game,
         SOUNDS / "gamemusic-6082.ogg",
-        speed=10,
+        speed=600,
     ),
-    "Game Over": Window(
+    "Endless Mode": lambda: EndlessLevel(my_game, list(SONGS), speed=420),
+    "Calibration": lambda: CalibrationScreen(my_game, SPRITES / "bg.png"),
+    "Loading": lambda: LoadingScreen(my_game, SPRITES / "bg.png"),
+    "Game Over": lambda: Window(
         SPRITES / "bg.png",
         {
             "message": TextButton(
@@ -242,6 +419,14 @@ my_game.windows = {
 
 
 def main():
+    parser = argparse.ArgumentParser(description=NAME)
+    parser.add_argument(
+        "--record", type=Path, help="save a recording of each level played here"
+    )
+    # Anything else on the command line is left for whatever started the game
+    args, _ = parser.parse_known_args()
+
+    my_game.record_to = args.record
     my_game.running_window = "Menu"
     asyncio.run(my_game.run())
 